@@ -1,4 +1,8 @@
 import os
+import shutil
+import tempfile
+
+import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -37,3 +41,14 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings):
+    """Картинки постов из фикстур пишутся во временную папку,
+    миниатюры и ленты готовятся сразу, без пула процессов."""
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    settings.THUMBNAIL_ASYNC = False
+    settings.TIMELINE_FANOUT_ASYNC = False
+    yield settings.MEDIA_ROOT
+    shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
@@ -0,0 +1,148 @@
+import json
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import resolve, reverse
+
+from core.query_budget import QueryBudget
+from posts.counters import rebuild_post_counters
+from posts.models import Group, Post, User
+
+FEED_POSTS = 25
+PAGE_LIMIT = 10
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiDog')
+        cls.other = User.objects.create_user(username='OtherDog')
+        cls.group = Group.objects.create(
+            title='Группа для API',
+            slug='api-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(FEED_POSTS)
+        )
+        Post.objects.create(text='Чужой пост', author=cls.other)
+        rebuild_post_counters()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed_urls(self):
+        return {
+            reverse('api:v1:index'): FEED_POSTS + 1,
+            reverse('api:v1:group_list',
+                    kwargs={'slug': self.group.slug}): FEED_POSTS,
+            reverse('api:v1:profile',
+                    kwargs={'username': self.author.username}): FEED_POSTS,
+        }
+
+    def get(self, url, params=None, **headers):
+        budget = resolve(url).func.query_budget
+        with QueryBudget(budget):
+            response = self.client.get(url, params, **headers)
+            data = None
+            if response.status_code == HTTPStatus.OK:
+                data = read_json(response)
+        return response, data
+
+    def test_feeds_walk_by_cursor(self):
+        """Лента целиком проходится по курсору без повторов и пропусков"""
+        for url, total in self.feed_urls().items():
+            with self.subTest(url=url):
+                ids = []
+                params = {'limit': PAGE_LIMIT}
+                while True:
+                    response, data = self.get(url, params)
+                    self.assertTrue(response.streaming)
+                    ids.extend(row['id'] for row in data['results'])
+                    if data['next'] is None:
+                        break
+                    params['cursor'] = data['next']
+                self.assertEqual(len(ids), total)
+                self.assertEqual(len(set(ids)), total)
+                self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_feed_rows_have_only_api_fields(self):
+        """Строка ленты содержит только поля API"""
+        _, data = self.get(reverse('api:v1:index'), {'limit': 1})
+        row = data['results'][0]
+        self.assertEqual(set(row),
+                         {'id', 'text', 'pub_date', 'author', 'group'})
+        self.assertEqual(row['author'], self.other.username)
+        self.assertIsNone(row['group'])
+
+    def test_limit_is_clamped(self):
+        """Некорректный limit заменяется значением по умолчанию"""
+        for limit, expected in (('abc', 10), ('0', 1), ('3', 3)):
+            with self.subTest(limit=limit):
+                _, data = self.get(reverse('api:v1:index'), {'limit': limit})
+                self.assertEqual(len(data['results']), expected)
+
+    def test_post_detail(self):
+        """Пост отдается по id, несуществующий — 404"""
+        post = Post.objects.filter(author=self.author).first()
+        url = reverse('api:v1:post_detail', kwargs={'post_id': post.pk})
+        _, data = self.get(url)
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        response = self.client.get(
+            reverse('api:v1:post_detail', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_unknown_feed_owner_is_404(self):
+        """Лента несуществующей группы или автора — 404"""
+        for url in (
+            reverse('api:v1:group_list', kwargs={'slug': 'missing'}),
+            reverse('api:v1:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_if_none_match_without_queries(self):
+        """Совпавший ETag дает 304 без чтения постов: только версия
+        ленты"""
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                response, _ = self.get(url)
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        """Новый пост и правка поста меняют ETag"""
+        post = Post.objects.filter(author=self.author).first()
+        detail = reverse('api:v1:post_detail', kwargs={'post_id': post.pk})
+        urls = list(self.feed_urls()) + [detail]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        post.text = 'Новый текст'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_cursor(self):
+        """Страницы одной ленты имеют разные ETag"""
+        url = reverse('api:v1:index')
+        first, data = self.get(url, {'limit': PAGE_LIMIT})
+        second, _ = self.get(url, {'limit': PAGE_LIMIT,
+                                   'cursor': data['next']})
+        self.assertNotEqual(first['ETag'], second['ETag'])
@@ -0,0 +1,155 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from core.query_budget import query_budget
+from posts.cache import params_digest, related_scopes, scope_stamp
+from posts.models import Group, Post, User
+from posts.paginators import FORWARD, after_cursor, decode_cursor, make_cursor
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 500
+# сколько постов сериализуется в один кусок потокового ответа
+STREAM_CHUNK = 50
+FEED_PARAMS = ('cursor', 'limit')
+
+
+# поля API и колонки, из которых они читаются
+API_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+ROW_COLUMNS = ('id', 'text', 'pub_date', 'author__username', 'group__slug')
+
+
+def post_rows(queryset):
+    """Только колонки, которые отдает API, без загрузки моделей."""
+    return queryset.values_list(*ROW_COLUMNS)
+
+
+def as_dict(row):
+    return dict(zip(API_FIELDS, row))
+
+
+def encode(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def scope_etag(scope_fmt, params=FEED_PARAMS, related=None):
+    """ETag по версии области и параметрам запроса.
+
+    Версия меняется сигналами при любой записи, видимой в области,
+    поэтому ответ 304 стоит одного запроса к FeedVersion по ключу.
+    related(request, **kwargs) добавляет области, от которых ответ
+    тоже зависит.
+    """
+    def etag(request, **kwargs):
+        scopes = [scope_fmt.format(**kwargs)]
+        if related is not None:
+            scopes.extend(related(request, **kwargs))
+        raw = f'v1|{",".join(scopes)}|{scope_stamp(request, *scopes)}|'
+        raw += params_digest(request, params)
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag
+
+
+def stream_feed(queryset, request):
+    """Страница ленты по курсору, сериализуемая по мере чтения строк.
+
+    Читается на одну строку больше limit: по ней понятно, есть ли
+    следующая страница, и курсор строится по последней отданной.
+    """
+    limit = get_limit(request)
+    cursor = decode_cursor(request.GET.get('cursor', ''))
+    if cursor is not None and cursor[0] == FORWARD:
+        _, pub_date, pk = cursor
+        queryset = after_cursor(queryset, pub_date, pk)
+    rows = post_rows(queryset.order_by('-pub_date', '-pk'))[:limit + 1]
+
+    def generate():
+        chunk = ['{"results": [']
+        last = has_next = None
+        for number, row in enumerate(rows.iterator()):
+            if number == limit:
+                has_next = True
+                break
+            if last is not None:
+                chunk.append(', ')
+            chunk.append(encode(as_dict(row)))
+            last = row
+            if len(chunk) >= STREAM_CHUNK:
+                yield ''.join(chunk)
+                chunk = []
+        next_cursor = None
+        if has_next:
+            pk, _, pub_date, *_ = last
+            next_cursor = make_cursor(pub_date, pk)
+        chunk.append(f'], "next": {encode(next_cursor)}}}')
+        yield ''.join(chunk)
+
+    return StreamingHttpResponse(generate(),
+                                 content_type='application/json')
+
+
+@require_safe
+@condition(etag_func=scope_etag('index'))
+@query_budget(2)
+def index(request):
+    """Главная лента в JSON"""
+    return stream_feed(Post.objects.all(), request)
+
+
+@require_safe
+@condition(etag_func=scope_etag('group:{slug}'))
+@query_budget(3)
+def group_posts(request, slug):
+    """Лента группы в JSON"""
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return stream_feed(Post.objects.filter(group_id=group.pk), request)
+
+
+@require_safe
+@condition(etag_func=scope_etag('profile:{username}'))
+@query_budget(3)
+def profile(request, username):
+    """Лента автора в JSON"""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return stream_feed(Post.objects.filter(author_id=author.pk), request)
+
+
+def load_row(request, post_id):
+    """Строка поста, прочитанная для ETag, достается и view."""
+    if not hasattr(request, 'post_row'):
+        request.post_row = post_rows(
+            Post.objects.filter(pk=post_id)).first()
+    return request.post_row
+
+
+def post_scopes(request, post_id):
+    """В ответе есть имя автора и slug группы."""
+    row = load_row(request, post_id)
+    if row is None:
+        return ()
+    return related_scopes(row[3], row[4])
+
+
+@require_safe
+@condition(etag_func=scope_etag('post:{post_id}', params=(),
+                                related=post_scopes))
+@query_budget(2)
+def post_detail(request, post_id):
+    """Пост в JSON"""
+    row = load_row(request, post_id)
+    if row is None:
+        raise Http404
+    return JsonResponse(as_dict(row),
+                        json_dumps_params={'ensure_ascii': False})
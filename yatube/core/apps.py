@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, db, slow_queries
+
+        connection_created.connect(db.configure_sqlite,
+                                   dispatch_uid='core.db')
+        connection_created.connect(slow_queries.install,
+                                   dispatch_uid='core.slow_queries')
+        post_save.connect(auth.forget_user, sender=settings.AUTH_USER_MODEL,
+                          dispatch_uid='core.auth.save')
+        post_delete.connect(auth.forget_user,
+                            sender=settings.AUTH_USER_MODEL,
+                            dispatch_uid='core.auth.delete')
+        if settings.TEMPLATE_WARMUP:
+            from .warmup import warmup
+            warmup()
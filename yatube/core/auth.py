@@ -0,0 +1,80 @@
+"""Пользователь запроса из кеша процесса.
+
+AuthenticationMiddleware на каждый запрос читает пользователя из базы.
+CachedAuthenticationMiddleware держит найденного пользователя
+USER_CACHE_SECONDS секунд в памяти процесса. Запись кеша годится
+только для сессии с тем же хешем пароля, а сохранение или удаление
+пользователя в этом процессе сбрасывает ее сразу. Смена пароля
+в другом процессе видна здесь не позже чем через USER_CACHE_SECONDS.
+Кеш хранит не больше USER_CACHE_SIZE пользователей, давно не
+заходившие вытесняются первыми.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+# id пользователя из сессии -> (backend, хеш для сессии,
+# пользователь, момент устаревания по time.monotonic); порядок —
+# от давно запрошенных к недавним
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_user(user_id):
+    with _lock:
+        cached = _users.get(user_id)
+        if cached is None:
+            return None
+        if time.monotonic() >= cached[3]:
+            del _users[user_id]
+            return None
+        _users.move_to_end(user_id)
+        return cached
+
+
+def remember_user(user_id, entry):
+    with _lock:
+        _users[user_id] = entry
+        _users.move_to_end(user_id)
+        while len(_users) > settings.USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но сначала из кеша."""
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    if user_id is None or not settings.USER_CACHE_SECONDS:
+        return auth.get_user(request)
+    backend = session.get(auth.BACKEND_SESSION_KEY)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    cached = cached_user(user_id)
+    if cached is not None:
+        cached_backend, cached_hash, user, _ = cached
+        if (cached_backend, cached_hash) == (backend, session_hash):
+            # копия: view может менять request.user
+            return copy.copy(user)
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        remember_user(user_id, (
+            backend, session_hash, copy.copy(user),
+            time.monotonic() + settings.USER_CACHE_SECONDS))
+    return user
+
+
+def forget_user(sender, instance, **kwargs):
+    """Обработчик post_save и post_delete пользователя."""
+    with _lock:
+        _users.pop(str(instance.pk), None)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,50 @@
+import math
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+User = get_user_model()
+
+
+def percentile(timings, share):
+    """Значение, не меньше которого share отсортированных замеров
+    (метод ближайшего ранга)."""
+    rank = math.ceil(share * len(timings))
+    return timings[max(rank, 1) - 1]
+
+
+def measure(func, repeat=20, setup=None):
+    """Замеряет время вызовов func, возвращает сводку в миллисекундах.
+
+    setup, если передан, вызывается перед каждым замером и в него
+    не входит.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'min': timings[0],
+        'p50': statistics.median(timings),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'max': timings[-1],
+    }
+
+
+class rollback_afterwards(transaction.Atomic):
+    """Транзакция, которая всегда откатывается: данные для замеров
+    не остаются в базе."""
+
+    def __init__(self, using=None):
+        super().__init__(using, savepoint=True)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        transaction.set_rollback(True, using=self.using)
+        return super().__exit__(exc_type, exc_value, traceback)
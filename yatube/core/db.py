@@ -0,0 +1,59 @@
+"""Настройка соединений SQLite и повтор записи при блокировке базы.
+
+PRAGMA из SQLITE_PRAGMAS выполняются на каждом новом соединении.
+В режиме WAL читатели не ждут пишущего, но SQLite по-прежнему
+допускает одного писателя: транзакция, которая начала с чтения
+и затем пишет, при занятой базе получает «database is locked»
+сразу, без ожидания busy_timeout. Такую транзакцию retry_locked
+повторяет целиком.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA из настроек."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    message = str(error)
+    return any(locked in message for locked in LOCKED_MESSAGES)
+
+
+def lock_backoff(attempt):
+    """Пауза перед повтором, секунды: экспонента со случайным
+    разбросом, чтобы писатели не просыпались одновременно."""
+    base = settings.DB_LOCK_BACKOFF_MS * 2 ** attempt / 1000
+    return base * random.uniform(0.5, 1.5)
+
+
+def retry_locked(func):
+    """Выполняет func в транзакции и повторяет ее, если база занята.
+
+    Повторяется только внешняя транзакция: вложенный блок нельзя
+    откатить и начать заново, поэтому ошибка из него пробрасывается.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = settings.DB_LOCK_RETRIES
+        for attempt in range(retries + 1):
+            outermost = not transaction.get_connection().in_atomic_block
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if not (outermost and attempt < retries
+                        and is_locked(error)):
+                    raise
+            time.sleep(lock_backoff(attempt))
+    return wrapper
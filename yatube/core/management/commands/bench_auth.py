@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import auth
+from core.benchmark import User, measure, rollback_afterwards
+
+MODES = (
+    # название, движок сессий, USER_CACHE_SECONDS
+    ('db', 'django.contrib.sessions.backends.db', 0),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db', 0),
+    ('cached_db+user', 'django.contrib.sessions.backends.cached_db', 30),
+)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет главную страницу для вошедшего пользователя: '
+            'сессии в базе, сессии в кеше и сессии в кеше вместе '
+            'с кешем пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        url = reverse('posts:index')
+        self.stdout.write(f'{"mode":>15} {"req/s":>7} {"p50 ms":>7} '
+                          f'{"p95 ms":>7} {"queries":>8} {"auth":>5}')
+        with rollback_afterwards():
+            user = User.objects.create_user(username='bench_auth')
+            for name, engine, seconds in MODES:
+                with override_settings(SESSION_ENGINE=engine,
+                                       USER_CACHE_SECONDS=seconds):
+                    auth._users.clear()
+                    # middleware и движок сессий загружаются клиентом
+                    # заново, поэтому клиент свой для каждого режима
+                    client = Client()
+                    client.force_login(user)
+                    client.get(url)
+                    result = measure(lambda: client.get(url),
+                                     options['repeat'])
+                    queries, auth_queries = self.count(client, url)
+                self.stdout.write(
+                    f'{name:>15} {1000 / result["p50"]:>7.0f} '
+                    f'{result["p50"]:>7.2f} {result["p95"]:>7.2f} '
+                    f'{queries:>8} {auth_queries:>5}')
+
+    def count(self, client, url):
+        """Все запросы к базе и запросы к сессиям и пользователям."""
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        tables = ('"django_session"', '"auth_user"')
+        auth_queries = [query for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT')
+                        and query['sql'].split(' FROM ')[1]
+                        .startswith(tables)]
+        return len(queries), len(auth_queries)
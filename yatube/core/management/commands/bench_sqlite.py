@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from core.benchmark import User, percentile
+from core.db import is_locked
+from posts.models import Post
+
+FEED_SIZE = 10
+
+
+def copy_database(source, target, journal_mode):
+    """Копия базы для замеров: запись не должна трогать рабочую базу.
+    Режим журнала хранится в самом файле, поэтому задается здесь."""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode = {journal_mode}')
+    dst.close()
+    src.close()
+
+
+def read_feed():
+    list(Post.objects.select_related('author', 'group')
+         .order_by('-pub_date', '-pk')[:FEED_SIZE])
+
+
+def summary(timings, errors, seconds):
+    timings.sort()
+    if not timings:
+        return {'rate': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0,
+                'errors': errors}
+    return {
+        'rate': len(timings) / seconds,
+        'p50': percentile(timings, 0.5),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'max': timings[-1],
+        'errors': errors,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Замеряет чтение ленты при одновременной записи постов '
+            'на копии базы: с настройкой соединений из core.db '
+            '(WAL, PRAGMA, долгие соединения, повтор при блокировке) '
+            'и без нее.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite.')
+        author_id = User.objects.values_list('pk', flat=True).first()
+        if author_id is None:
+            raise CommandError('В базе нет пользователей: сначала '
+                               'заполните ее командой seed.')
+        # у соединений всех потоков общий словарь настроек базы
+        database = connections.databases['default']
+        original = database['NAME'], database['CONN_MAX_AGE']
+        connections.close_all()
+        modes = (
+            ('plain', 'delete', 0,
+             {'SQLITE_PRAGMAS': {}, 'DB_LOCK_RETRIES': 0}),
+            ('tuned', 'wal', original[1], {}),
+        )
+        self.stdout.write(
+            f'{"mode":>6} {"op":>6} {"ops/s":>8} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"max ms":>8} {"locked":>7}')
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for name, journal_mode, max_age, overrides in modes:
+                    path = os.path.join(directory, f'{name}.sqlite3')
+                    copy_database(original[0], path, journal_mode)
+                    database['NAME'], database['CONN_MAX_AGE'] = (
+                        path, max_age)
+                    with override_settings(**overrides):
+                        results = self.run(author_id, options)
+                    connections.close_all()
+                    for op, result in results.items():
+                        self.report(name, op, result)
+        finally:
+            database['NAME'], database['CONN_MAX_AGE'] = original
+
+    def run(self, author_id, options):
+        seconds = options['seconds']
+        deadline = time.perf_counter() + seconds
+        reads, writes, errors = [], [], {'read': 0, 'write': 0}
+
+        def write_post():
+            Post.objects.create(text='Пост для замера', author_id=author_id)
+
+        threads = [
+            threading.Thread(target=self.work,
+                             args=(read_feed, deadline, reads, errors,
+                                   'read'))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=self.work,
+                             args=(write_post, deadline, writes, errors,
+                                   'write'))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            'read': summary(reads, errors['read'], seconds),
+            'write': summary(writes, errors['write'], seconds),
+        }
+
+    def work(self, operation, deadline, timings, errors, kind):
+        """Поток-клиент: повторяет operation до deadline. Соединение
+        после каждой операции обрабатывается, как в конце запроса."""
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError as error:
+                    if not is_locked(error):
+                        raise
+                    errors[kind] += 1
+                else:
+                    timings.append((time.perf_counter() - start) * 1000)
+                finally:
+                    connections['default'].close_if_unusable_or_obsolete()
+        finally:
+            connections.close_all()
+
+    def report(self, mode, op, result):
+        self.stdout.write(
+            f'{mode:>6} {op:>6} {result["rate"]:>8.0f} '
+            f'{result["p50"]:>8.2f} {result["p95"]:>8.2f} '
+            f'{result["p99"]:>8.2f} {result["max"]:>8.2f} '
+            f'{result["errors"]:>7}')
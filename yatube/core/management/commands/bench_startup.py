@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Post
+
+MODES = (
+    # название, TEMPLATE_CACHE, TEMPLATE_WARMUP
+    ('plain', '0', '0'),
+    ('cached', '1', '0'),
+    ('warmup', '1', '1'),
+)
+# выполняется в отдельном процессе: холодный старт нельзя повторить
+# в уже запущенном
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+ready = time.perf_counter()
+from django.core.cache import cache
+from django.test import Client
+client = Client()
+requests = []
+for url in sys.argv[1:]:
+    timings = []
+    for _ in range(2):
+        # страничный кеш не должен подменять рендеринг
+        cache.clear()
+        moment = time.perf_counter()
+        client.get(url)
+        timings.append(time.perf_counter() - moment)
+    requests.append(timings)
+print(json.dumps({'setup': ready - start, 'requests': requests}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запуск процесса и первые запросы к страницам '
+            'без кеша шаблонов, с кешем и с прогревом при старте.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='запусков процесса на каждый режим')
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        if post is None:
+            raise CommandError('В базе нет постов в группах: сначала '
+                               'заполните ее командой seed.')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ]
+        self.stdout.write(f'{"mode":>8} {"setup ms":>9} {"first ms":>9} '
+                          f'{"second ms":>10}')
+        for name, cache_templates, warm in MODES:
+            runs = [self.start(urls, cache_templates, warm)
+                    for _ in range(options['runs'])]
+            setup = statistics.median(run['setup'] for run in runs)
+            # первый и второй запрос — сумма по всем страницам
+            first, second = (
+                statistics.median(sum(timings[index]
+                                      for timings in run['requests'])
+                                  for run in runs)
+                for index in (0, 1))
+            self.stdout.write(f'{name:>8} {setup * 1000:>9.1f} '
+                              f'{first * 1000:>9.1f} '
+                              f'{second * 1000:>10.1f}')
+
+    def start(self, urls, cache_templates, warm):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'yatube.settings'),
+            'TEMPLATE_CACHE': cache_templates,
+            'TEMPLATE_WARMUP': warm,
+        }
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, *urls], env=env,
+            cwd=settings.BASE_DIR, check=True, capture_output=True,
+            text=True)
+        return json.loads(result.stdout.splitlines()[-1])
@@ -0,0 +1,154 @@
+import json
+from importlib import import_module
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmark import User, measure, rollback_afterwards
+from posts.models import Group, Post
+
+URLCONFS = ('posts.urls', 'users.urls', 'about.urls')
+# страницы, которые без входа отвечают редиректом на логин
+LOGIN_REQUIRED = {'posts:post_create', 'posts:post_edit',
+                  'posts:follow_index'}
+# адреса только для POST, меняющие данные: повторять их нельзя
+WRITE_ONLY = {'posts:profile_follow', 'posts:profile_unfollow'}
+SUMMARY_KEYS = ('min', 'p50', 'p95', 'p99', 'max')
+
+
+def scales(value):
+    return [int(scale.replace('_', '')) for scale in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95/p99 времени ответа и число запросов к базе '
+            'для всех адресов posts, users и about. С --scales каждый '
+            'прогон идет на базе, дополненной командой seed до нужного '
+            'числа постов, и откатывается после замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=scales,
+                            help='числа постов через запятую, '
+                                 'например 10_000,1_000_000')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='очищать кеш перед каждым запросом')
+        parser.add_argument('--json', dest='json_path',
+                            help='файл для результатов в JSON, '
+                                 '"-" — вывести в stdout')
+
+    def handle(self, *args, **options):
+        self.table = options['json_path'] != '-'
+        runs = []
+        for scale in options['scales'] or [None]:
+            with rollback_afterwards():
+                if scale is not None:
+                    self.seed(scale)
+                runs.append(self.run(options['repeat'],
+                                     options['cold_cache']))
+        if options['json_path']:
+            report = json.dumps({'runs': runs}, ensure_ascii=False,
+                                indent=2)
+            if options['json_path'] == '-':
+                self.stdout.write(report)
+            else:
+                with open(options['json_path'], 'w',
+                          encoding='utf-8') as stream:
+                    stream.write(report)
+
+    def seed(self, scale):
+        missing = scale - Post.objects.count()
+        if missing > 0:
+            call_command('seed', posts=missing,
+                         users=max(missing // 100, 10),
+                         groups=max(missing // 1_000, 5),
+                         verbosity=0, stdout=self.stderr)
+
+    def run(self, repeat, cold_cache):
+        samples = self.samples()
+        anonymous = Client()
+        author = Client()
+        author.force_login(samples['author'])
+        results = []
+        for name, path, params in self.urls(samples):
+            client = author if name in LOGIN_REQUIRED else anonymous
+            # журнал запросов ограничен по длине, и после seed он полон:
+            # без очистки CaptureQueriesContext насчитал бы ноль
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                status = client.get(path, params).status_code
+            # следующий запрос очистит журнал, число нужно взять сейчас
+            query_count = len(queries)
+            timings = measure(lambda: client.get(path, params), repeat,
+                              setup=cache.clear if cold_cache else None)
+            results.append({
+                'name': name,
+                'path': path,
+                'status': status,
+                'queries': query_count,
+                **{key: round(timings[key], 3) for key in SUMMARY_KEYS},
+            })
+        run = {
+            'posts': Post.objects.count(),
+            'repeat': repeat,
+            'cold_cache': cold_cache,
+            'timestamp': timezone.now().isoformat(),
+            'results': results,
+        }
+        if self.table:
+            self.write_table(run)
+        return run
+
+    def samples(self):
+        """Объекты для адресов с параметрами: самые большие группа
+        и автор — худший случай для их лент."""
+        author = (User.objects.order_by('-profile__posts_count', 'pk')
+                  .first())
+        if author is None:
+            raise CommandError('В базе нет пользователей: заполните ее '
+                               'командой seed или укажите --scales')
+        group = Group.objects.order_by('-posts_count', 'pk').first()
+        post = Post.objects.filter(author=author).first()
+        return {
+            'author': author,
+            'kwargs': {
+                'slug': group.slug if group else 'missing',
+                'username': author.username,
+                'post_id': post.pk if post else 0,
+            },
+            'params': {
+                'posts:search': {
+                    'q': post.text.split()[0] if post else 'пост'},
+                'posts:group_lookup': {
+                    'q': group.title[:2] if group else ''},
+            },
+        }
+
+    def urls(self, samples):
+        for urlconf in URLCONFS:
+            module = import_module(urlconf)
+            for pattern in module.urlpatterns:
+                name = f'{module.app_name}:{pattern.name}'
+                if name in WRITE_ONLY:
+                    continue
+                kwargs = {key: samples['kwargs'][key]
+                          for key in pattern.pattern.converters}
+                yield (name, reverse(name, kwargs=kwargs),
+                       samples['params'].get(name, {}))
+
+    def write_table(self, run):
+        self.stdout.write(f'\n{run["posts"]} постов, {run["repeat"]} '
+                          f'запросов на адрес, мс')
+        self.stdout.write(f'{"name":<22} {"status":>6} {"queries":>7} '
+                          + ' '.join(f'{key:>8}' for key in SUMMARY_KEYS))
+        for result in run['results']:
+            self.stdout.write(
+                f'{result["name"]:<22} {result["status"]:>6} '
+                f'{result["queries"]:>7} '
+                + ' '.join(f'{result[key]:>8.2f}' for key in SUMMARY_KEYS))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = ('Компилирует шаблоны из каталогов DIRS и обращает все '
+            'именованные URL, как при запуске воркера с TEMPLATE_WARMUP.')
+
+    def handle(self, *args, **options):
+        result = warmup()
+        self.stdout.write(
+            f'Шаблонов: {result["templates"]}, URL: {result["urls"]}, '
+            f'файлов статики: {result["static"]} '
+            f'за {result["seconds"] * 1000:.1f} мс')
+        if not settings.TEMPLATE_CACHE:
+            self.stderr.write(self.style.WARNING(
+                'TEMPLATE_CACHE выключен: скомпилированные шаблоны '
+                'не сохраняются между запросами.'))
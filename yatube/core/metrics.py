@@ -0,0 +1,285 @@
+"""Метрики запросов в формате Prometheus.
+
+Каждый процесс копит метрики в памяти. Все значения — суммы
+(счетчики и корзины гистограмм), поэтому метрики нескольких
+процессов складываются поэлементно: если задан METRICS_DIR, процесс
+время от времени сбрасывает свои значения в файл, а /metrics
+суммирует файлы всех процессов.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+FLUSH_INTERVAL = 1.0
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+FAMILIES = {
+    'yatube_requests_total': (
+        COUNTER, 'Обработанные запросы'),
+    'yatube_request_duration_seconds': (
+        HISTOGRAM, 'Время ответа до первого байта'),
+    'yatube_db_queries': (
+        HISTOGRAM, 'Запросов к базе на один ответ'),
+    'yatube_db_query_seconds_total': (
+        COUNTER, 'Суммарное время запросов к базе'),
+    'yatube_template_render_seconds': (
+        HISTOGRAM, 'Время рендеринга шаблонов на один ответ'),
+    'yatube_response_size_bytes': (
+        HISTOGRAM, 'Размер тела ответа'),
+}
+
+# каждый поток копит значения в своем словаре без блокировки:
+# (имя, метки) -> значение; метки — кортеж пар (имя, значение).
+# Словари потоков складываются только при чтении и сбросе в файл
+_registry_lock = threading.Lock()
+_thread_samples = []
+_local = threading.local()
+_last_flush = 0.0
+# (pid, имя файла процесса); вычисляется при первом сбросе, а не при
+# импорте: модуль может загрузиться в мастере до fork рабочих процессов
+_process = None
+_request = threading.local()
+
+
+def thread_samples():
+    """Словарь значений текущего потока. Словари завершившихся
+    потоков остаются в реестре: счетчики не должны уменьшаться."""
+    samples = getattr(_local, 'samples', None)
+    if samples is None:
+        samples = _local.samples = {}
+        with _registry_lock:
+            _thread_samples.append(samples)
+    return samples
+
+
+def add(samples, key, value):
+    samples[key] = samples.get(key, 0.0) + value
+
+
+def inc(name, labels, value=1):
+    add(thread_samples(), (name, labels), value)
+
+
+def observe(name, labels, value, buckets):
+    """Добавляет наблюдение в гистограмму name."""
+    samples = thread_samples()
+    for bound in buckets:
+        # пустые корзины тоже выводятся: без них histogram_quantile
+        # в Prometheus считает неточно
+        add(samples, (f'{name}_bucket', labels + (('le', bound),)),
+            value <= bound)
+    add(samples, (f'{name}_bucket', labels + (('le', '+Inf'),)), 1)
+    add(samples, (f'{name}_sum', labels), value)
+    add(samples, (f'{name}_count', labels), 1)
+
+
+@contextmanager
+def collecting():
+    """Копит время шаблонов и запросов к базе текущего запроса."""
+    _request.stats = {'queries': 0, 'query_seconds': 0.0,
+                      'render_seconds': 0.0, 'render_depth': 0}
+    try:
+        yield _request.stats
+    finally:
+        del _request.stats
+
+
+def current_stats():
+    return getattr(_request, 'stats', None)
+
+
+@contextmanager
+def timed_render():
+    """Учитывает время рендеринга шаблона; вложенные рендеры (например,
+    карточки постов внутри страницы) не считаются дважды."""
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+    stats['render_depth'] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats['render_depth'] -= 1
+        if not stats['render_depth']:
+            stats['render_seconds'] += time.perf_counter() - start
+
+
+def count_query(execute, sql, params, many, context):
+    """Обертка execute_wrapper: число и время запросов к базе."""
+    stats = current_stats()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats['queries'] += 1
+            stats['query_seconds'] += time.perf_counter() - start
+
+
+def snapshot():
+    """Сумма значений всех потоков процесса."""
+    with _registry_lock:
+        registry = list(_thread_samples)
+    total = defaultdict(float)
+    for samples in registry:
+        # copy выполняется целиком под GIL и не видит словарь
+        # посреди вставки из другого потока
+        for key, value in samples.copy().items():
+            total[key] += value
+    return dict(total)
+
+
+def process_file():
+    """Имя файла процесса в METRICS_DIR.
+
+    Имя начинается с pid, по нему collect узнает файлы завершившихся
+    процессов, и помечено временем: pid может достаться новому
+    процессу, и его счетчики не должны затереть старые.
+    """
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f'{pid}-{time.time_ns()}.json')
+    return _process[1]
+
+
+def forget_parent():
+    """После fork значения родителя остаются в его файле, а потомок
+    считает с нуля в своем."""
+    global _last_flush
+    reset()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=forget_parent)
+
+
+def flush(force=False):
+    """Сбрасывает метрики процесса в METRICS_DIR не чаще
+    FLUSH_INTERVAL секунд."""
+    global _last_flush
+    directory = getattr(settings, 'METRICS_DIR', None)
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < FLUSH_INTERVAL):
+        return
+    _last_flush = now
+    rows = [[name, list(labels), value]
+            for (name, labels), value in snapshot().items()]
+    path = os.path.join(directory, process_file())
+    os.makedirs(directory, exist_ok=True)
+    with open(f'{path}.tmp', 'w') as stream:
+        json.dump(rows, stream)
+    os.replace(f'{path}.tmp', path)
+
+
+def collect():
+    """Сумма метрик всех процессов: файлы METRICS_DIR
+    и свежие значения текущего процесса."""
+    total = defaultdict(float)
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory and os.path.isdir(directory):
+        own_file = process_file()
+        for filename in os.listdir(directory):
+            if filename == own_file or not filename.endswith('.json'):
+                continue
+            path = os.path.join(directory, filename)
+            if not process_alive(filename):
+                adopt(path)
+                continue
+            for key, value in read_file(path).items():
+                total[key] += value
+    for key, value in snapshot().items():
+        total[key] += value
+    return total
+
+
+def read_file(path):
+    try:
+        with open(path) as stream:
+            rows = json.load(stream)
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(tuple(pair) for pair in labels)): value
+            for name, labels, value in rows}
+
+
+def process_alive(filename):
+    """Жив ли процесс, записавший файл. Файлы с именем не по
+    формату pid-время считаются живыми и не трогаются."""
+    try:
+        pid = int(filename.split('-', 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # процесс есть, но принадлежит другому пользователю
+        pass
+    return True
+
+
+def adopt(path):
+    """Переносит значения завершившегося процесса в свои.
+
+    Счетчики не должны уменьшаться, поэтому файл не удаляется, а
+    складывается в файл текущего процесса. Файл сначала забирается
+    переименованием: из нескольких процессов это удается одному,
+    и значения не учитываются дважды.
+    """
+    claimed = f'{path}.{os.getpid()}.adopted'
+    try:
+        os.rename(path, claimed)
+    except OSError:
+        return
+    samples = thread_samples()
+    for key, value in read_file(claimed).items():
+        add(samples, key, value)
+    flush(force=True)
+    os.remove(claimed)
+
+
+def escape_label(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(samples):
+    """Текст метрик в формате экспозиции Prometheus."""
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        names = ((family,) if kind == COUNTER else
+                 (f'{family}_bucket', f'{family}_sum', f'{family}_count'))
+        for name in names:
+            for (sample, labels), value in samples.items():
+                if sample != name:
+                    continue
+                label_text = ','.join(f'{key}="{escape_label(label)}"'
+                                      for key, label in labels)
+                lines.append(f'{name}{{{label_text}}} '
+                             f'{format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _registry_lock:
+        for samples in _thread_samples:
+            samples.clear()
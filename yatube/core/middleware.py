@@ -0,0 +1,56 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+UNRESOLVED = '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Собирает метрики каждого запроса по имени URL: время ответа,
+    число и время запросов к базе, время рендеринга шаблонов и размер
+    ответа. Стоит первым в MIDDLEWARE, чтобы учитывать всю обработку."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.collecting() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        labels = (('view', view), ('method', request.method))
+        metrics.inc('yatube_requests_total',
+                    labels + (('status', str(response.status_code)),))
+        metrics.observe('yatube_request_duration_seconds', labels, elapsed,
+                        metrics.LATENCY_BUCKETS)
+        metrics.observe('yatube_db_queries', labels, stats['queries'],
+                        metrics.QUERY_BUCKETS)
+        metrics.inc('yatube_db_query_seconds_total', labels,
+                    stats['query_seconds'])
+        metrics.observe('yatube_template_render_seconds', labels,
+                        stats['render_seconds'], metrics.LATENCY_BUCKETS)
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, labels)
+        else:
+            metrics.observe('yatube_response_size_bytes', labels,
+                            len(response.content), metrics.SIZE_BUCKETS)
+        metrics.flush()
+        return response
+
+    def measure_stream(self, content, labels):
+        """Размер потокового ответа известен только после отправки."""
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        metrics.observe('yatube_response_size_bytes', labels, size,
+                        metrics.SIZE_BUCKETS)
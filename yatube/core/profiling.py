@@ -0,0 +1,174 @@
+"""Профилирование отдельных запросов через cProfile.
+
+Запрос профилируется, если сотрудник добавил к адресу ?profile или
+если он попал в случайную выборку с долей PROFILING_SAMPLE_RATE.
+Результат пишется в PROFILING_DIR/<имя URL>/: .prof для pstats
+и .collapsed — свернутые стеки для flamegraph.pl и speedscope.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_PARAM = 'profile'
+# сколько последних профилей хранится для каждого имени URL
+KEEP_SAMPLES = 50
+MAX_STACK_DEPTH = 100
+# пути дешевле микросекунды не разворачиваются: иначе число путей
+# в графе вызовов растет экспоненциально
+MIN_PATH_SECONDS = 1e-6
+
+
+def sample_dir(view_name):
+    return os.path.join(settings.PROFILING_DIR,
+                        re.sub(r'[^\w.-]', '_', view_name))
+
+
+def collapse(stats):
+    """Свернутые стеки «a;b;c микросекунды» для flamegraph."""
+    lines = []
+    for path, seconds in fold_stacks(stats).items():
+        micros = round(seconds * 1_000_000)
+        if micros:
+            lines.append(f'{";".join(map(label, path))} {micros}')
+    return '\n'.join(lines) + '\n'
+
+
+def callee_graph(stats):
+    """caller -> [(callee, время callee при вызове из caller)]."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    return callees
+
+
+def fold_stacks(stats):
+    """Собственное время функций по путям вызова из графа pstats.
+
+    cProfile не хранит полные стеки, поэтому время функции делится
+    между путями к ней пропорционально времени по каждому ребру
+    вызова. Для поиска горячих путей этого приближения хватает.
+    """
+    callees = callee_graph(stats)
+    folded = Counter()
+
+    def walk(path, share):
+        func = path[-1]
+        _, _, own_time, total_time, _ = stats.stats[func]
+        fraction = share / total_time if total_time else 0
+        folded[path] += own_time * fraction
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            # рекурсия сворачивается в первый вход в функцию
+            callee_share = edge_time * fraction
+            if callee not in path and callee_share >= MIN_PATH_SECONDS:
+                walk(path + (callee,), callee_share)
+
+    for func, (_, _, _, total_time, callers) in stats.stats.items():
+        if not callers:
+            walk((func,), total_time)
+    return folded
+
+
+def label(func):
+    filename, line, name = func
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def save(profile, view_name):
+    directory = sample_dir(view_name)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f'{time.time_ns()}-{os.getpid()}')
+    profile.dump_stats(f'{base}.prof')
+    with open(f'{base}.collapsed', 'w') as stream:
+        stream.write(collapse(pstats.Stats(profile)))
+    prune(directory)
+
+
+def prune(directory):
+    samples = sorted(name for name in os.listdir(directory)
+                     if name.endswith('.prof'))
+    for name in samples[:-KEEP_SAMPLES]:
+        base = os.path.join(directory, name[:-len('.prof')])
+        for suffix in ('.prof', '.collapsed'):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def recent_samples(view_name=None):
+    """Пути .prof из PROFILING_DIR, по всем URL или одному."""
+    root = settings.PROFILING_DIR
+    if not root or not os.path.isdir(root):
+        return []
+    directories = ([sample_dir(view_name)] if view_name else
+                   [os.path.join(root, name) for name in os.listdir(root)])
+    return [os.path.join(directory, name)
+            for directory in directories if os.path.isdir(directory)
+            for name in sorted(os.listdir(directory))
+            if name.endswith('.prof')]
+
+
+def top_functions(paths, sort='cumulative', limit=30):
+    """Самые дорогие функции по сумме профилей paths."""
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        calls, _, own_time, total_time, _ = stats.stats[func]
+        rows.append({
+            'function': label(func),
+            'calls': calls,
+            'tottime': own_time * 1000,
+            'cumtime': total_time * 1000,
+        })
+    return rows
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы через cProfile.
+
+    Стоит последним в MIDDLEWARE: профиль включается в process_view,
+    когда известно имя URL, а выключается в __call__ после того, как
+    обработчик вызвал view, отрендерил TemplateResponse и при ошибке
+    передал ее в process_exception остальных middleware. Без
+    PROFILING_DIR не подключается вовсе, а для непрофилируемого
+    запроса стоит одного random().
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_DIR', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        request.profile = None
+        try:
+            return self.get_response(request)
+        finally:
+            if request.profile is not None:
+                request.profile.disable()
+                save(request.profile, request.resolver_match.view_name)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.wanted(request):
+            request.profile = cProfile.Profile()
+            request.profile.enable()
+
+    def wanted(self, request):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return (PROFILE_PARAM in request.GET
+                and request.user.is_staff)
@@ -0,0 +1,38 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет, сколько запросов к базе может сделать view.
+
+    Лимит считает все запросы одного обращения к странице, включая
+    сессию и пользователя для страниц, закрытых login_required.
+    Сам view не оборачивается: лимит сохраняется в атрибуте
+    query_budget и проверяется тестами через QueryBudget.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryBudget(CaptureQueriesContext):
+    """Контекстный менеджер: падает, если внутри блока выполнено
+    больше limit запросов."""
+
+    def __init__(self, limit, using=connection):
+        super().__init__(using)
+        self.limit = limit
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self) > self.limit:
+            queries = '\n'.join(
+                query['sql'] for query in self.captured_queries)
+            raise QueryBudgetExceeded(
+                f'{len(self)} запросов при бюджете {self.limit}:\n{queries}'
+            )
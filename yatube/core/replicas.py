@@ -0,0 +1,124 @@
+"""Чтение лент с реплик базы.
+
+Views, помеченные replica_reads, читают с одной из исправных реплик
+DATABASE_REPLICAS, остальной код всегда работает с основной базой.
+Пользователь, который только что писал, PRIMARY_STICKY_SECONDS читает
+с основной базы: реплика может еще не содержать его запись.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PRIMARY_COOKIE = 'primary_reads'
+
+_state = threading.local()
+# alias -> (исправна ли, время проверки по time.monotonic)
+_health = {}
+
+
+def check(alias):
+    """Реплика исправна, если к ней можно подключиться и выполнить
+    запрос; неисправное соединение закрывается."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        connection.close()
+        return False
+    return True
+
+
+def is_healthy(alias):
+    healthy, checked = _health.get(alias, (None, None))
+    now = time.monotonic()
+    if checked is None or now - checked >= settings.REPLICA_CHECK_INTERVAL:
+        healthy = check(alias)
+        _health[alias] = healthy, now
+    return healthy
+
+
+def mark_unhealthy(alias):
+    _health[alias] = False, time.monotonic()
+
+
+def choose_replica():
+    """Случайная исправная реплика или None, если таких нет."""
+    replicas = [alias for alias in settings.DATABASE_REPLICAS
+                if is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def reading_from_replica():
+    """Идет ли чтение текущего запроса с реплики."""
+    return getattr(_state, 'read_alias', None) is not None
+
+
+def replica_reads(view):
+    """Направляет чтение view на реплику.
+
+    Если запрос к реплике падает, она помечается неисправной, и view
+    выполняется заново с основной базой: view только читает, поэтому
+    повтор безопасен.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = None
+        if PRIMARY_COOKIE not in request.COOKIES:
+            alias = choose_replica()
+        if alias is None:
+            return view(request, *args, **kwargs)
+        # сессия и пользователь читаются с основной базы: на реплике
+        # может еще не быть только что созданной сессии
+        request.user.is_authenticated
+        _state.read_alias = alias
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            mark_unhealthy(alias)
+            connections[alias].close()
+            _state.read_alias = None
+            return view(request, *args, **kwargs)
+        finally:
+            _state.read_alias = None
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтение — с реплики, выбранной replica_reads, запись и все
+    остальное — с основной базы."""
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'read_alias', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # реплики — копии основной базы, схема приходит вместе с ними
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PrimaryStickinessMiddleware:
+    """После запроса с записью ставит cookie, по которой чтение
+    PRIMARY_STICKY_SECONDS идет с основной базы (read-your-writes)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        response = self.get_response(request)
+        if _state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PRIMARY_COOKIE, '1',
+                                max_age=settings.PRIMARY_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,123 @@
+"""Журнал медленных и повторяющихся запросов к базе.
+
+Обертка execute_wrapper ставится на каждое соединение при его
+открытии. Запрос дольше SLOW_QUERY_THRESHOLD_MS и запрос, выполненный
+в одном ответе SLOW_QUERY_REPEAT_THRESHOLD раз (вероятный N+1),
+записываются в кольцевой буфер recent и в логгер yatube.slow_queries
+вместе с view и местом вызова: строкой шаблона или кадром кода проекта.
+"""
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('yatube.slow_queries')
+
+SLOW = 'slow'
+REPEATED = 'repeated'
+PARAMS_LIMIT = 500
+PROJECT_DIR = settings.BASE_DIR
+# кадры стандартной библиотеки и пакетов не считаются кодом проекта,
+# даже если виртуальное окружение лежит внутри BASE_DIR
+SKIPPED_DIRS = tuple({sysconfig.get_paths()[name]
+                      for name in ('stdlib', 'purelib', 'platlib')})
+
+recent = deque(maxlen=getattr(settings, 'SLOW_QUERY_BUFFER', 200))
+_request = threading.local()
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка execute_wrapper для всех соединений."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            report(SLOW, sql, params, context, duration=duration)
+        repeats = getattr(_request, 'repeats', None)
+        if repeats is not None:
+            # SQL от Django приходит с плейсхолдерами, без значений,
+            # поэтому одинаковые по форме запросы совпадают по строке
+            repeats[sql] += 1
+            if repeats[sql] == settings.SLOW_QUERY_REPEAT_THRESHOLD:
+                report(REPEATED, sql, params, context,
+                       count=repeats[sql])
+
+
+def report(kind, sql, params, context, **extra):
+    entry = {
+        'time': timezone.now().isoformat(),
+        'kind': kind,
+        'alias': context['connection'].alias,
+        'view': getattr(_request, 'view', None),
+        'site': call_site(),
+        'sql': sql,
+        'params': repr(params)[:PARAMS_LIMIT],
+        **extra,
+    }
+    if 'duration' in entry:
+        entry['duration'] = round(entry['duration'], 3)
+    recent.append(entry)
+    logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+def call_site():
+    """Строка шаблона, при рендеринге которой выполнен запрос,
+    или ближайший кадр кода проекта."""
+    frame = sys._getframe(1)
+    project_frame = None
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if (frame.f_code.co_name == 'render_annotated'
+                and getattr(node, 'origin', None) is not None
+                and getattr(node, 'token', None) is not None):
+            return f'{node.origin.template_name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (project_frame is None and filename.startswith(PROJECT_DIR)
+                and filename != __file__
+                and not filename.startswith(SKIPPED_DIRS)):
+            project_frame = frame
+        frame = frame.f_back
+    if project_frame is None:
+        return None
+    filename = os.path.relpath(project_frame.f_code.co_filename,
+                               PROJECT_DIR)
+    return (f'{filename}:{project_frame.f_lineno} '
+            f'in {project_frame.f_code.co_name}')
+
+
+def install(sender=None, connection=None, **kwargs):
+    """Обработчик connection_created: ставит обертку один раз на
+    соединение, в том числе после переподключения."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class SlowQueryMiddleware:
+    """Относит запросы к базе к view, который их выполнил.
+
+    Повторы считаются с момента выбора view до конца ответа, включая
+    рендеринг TemplateResponse; потоковые ответы, читающие базу после
+    возврата из middleware, в подсчет не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            _request.__dict__.clear()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _request.view = f'{view_func.__module__}.{view_func.__qualname__}'
+        _request.repeats = Counter()
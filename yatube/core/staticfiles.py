@@ -0,0 +1,154 @@
+"""Боевая сборка и раздача статики.
+
+PrecompressedManifestStorage — хранилище для collectstatic: перед
+расчетом хешей пережимает PNG без потерь, затем дает файлам имена
+с хешем содержимого и кладет рядом сжатые копии .gz и, если
+установлен пакет brotli, .br. Файлы с хешем в имени никогда
+не меняются, поэтому static_view отдает их с Cache-Control immutable
+и выбирает сжатую копию по Accept-Encoding.
+"""
+import gzip
+import os
+import re
+import struct
+import zlib
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ico', '.json', '.map', '.txt',
+                '.xml', '.html')
+# сжатая копия не пишется, если выигрыш меньше 5%
+MIN_RATIO = 0.95
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# вспомогательные чанки, которые не влияют на картинку
+PNG_DROPPED = {b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+PNG_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+
+def encodings():
+    """Кодировки сжатых копий в порядке предпочтения при раздаче."""
+    available = [('gzip', '.gz')]
+    if brotli is not None:
+        available.insert(0, ('br', '.br'))
+    return available
+
+
+def accepted(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    result = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = re.search(r'q=(\d+(?:\.\d*)?)', params)
+        if quality is None or float(quality.group(1)) > 0:
+            result.add(coding.strip().lower())
+    return result
+
+
+def negotiate(path, accept_encoding):
+    """Путь к сжатой копии файла, которую примет клиент, и ее
+    кодировка; без подходящей копии — сам файл и None."""
+    codings = accepted(accept_encoding)
+    for encoding, suffix in encodings():
+        if encoding in codings and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0: одинаковый файл дает одинаковый архив при каждой сборке
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def png_chunks(data):
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        yield kind, data[position + 8:position + 8 + length]
+        position += length + 12
+
+
+def png_chunk(kind, body):
+    return (struct.pack('>I', len(body)) + kind + body
+            + struct.pack('>I', zlib.crc32(kind + body)))
+
+
+def deflate(raw):
+    """Самый короткий поток zlib из нескольких стратегий сжатия."""
+    results = []
+    for strategy in PNG_STRATEGIES:
+        packer = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        results.append(packer.compress(raw) + packer.flush())
+    return min(results, key=len)
+
+
+def optimize_png(data):
+    """PNG без потерь: данные изображения пережимаются с наибольшим
+    уровнем zlib в один чанк IDAT, текстовые чанки и время
+    удаляются. Если меньше не получилось, возвращает data."""
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    parts, idat = [PNG_SIGNATURE], []
+    try:
+        for kind, body in png_chunks(data):
+            if kind == b'IDAT':
+                if not idat:
+                    parts.append(None)
+                idat.append(body)
+            elif kind not in PNG_DROPPED:
+                parts.append(png_chunk(kind, body))
+        packed = deflate(zlib.decompress(b''.join(idat)))
+    except (struct.error, zlib.error):
+        return data
+    if not idat:
+        return data
+    parts[parts.index(None)] = png_chunk(b'IDAT', packed)
+    optimized = b''.join(parts)
+    return optimized if len(optimized) < len(data) else data
+
+
+class PrecompressedManifestStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            if name.endswith('.png'):
+                self.optimize_image(name)
+        yield from super().post_process(paths, dry_run, **options)
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE):
+                self.write_compressed(hashed_name)
+
+    def optimize_image(self, name):
+        """Пережимает картинку до расчета хеша: хеш в имени должен
+        соответствовать тому, что будет отдано."""
+        path = self.path(name)
+        with open(path, 'rb') as stream:
+            data = stream.read()
+        optimized = optimize_png(data)
+        if optimized is not data:
+            with open(path, 'wb') as stream:
+                stream.write(optimized)
+
+    def write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as stream:
+            data = stream.read()
+        for encoding, suffix in encodings():
+            packed = compress(data, encoding)
+            if len(packed) < len(data) * MIN_RATIO:
+                with open(path + suffix, 'wb') as stream:
+                    stream.write(packed)
+
+    def is_hashed(self, name):
+        """Имя с хешем содержимого из манифеста сборки."""
+        if not hasattr(self, '_hashed_names'):
+            self._hashed_names = frozenset(self.hashed_files.values())
+        return name in self._hashed_names
@@ -0,0 +1,23 @@
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import timed_render
+
+
+class TimedTemplate(Template):
+    """Шаблон, рендеринг которого учитывается в метриках запроса."""
+
+    def render(self, context=None, request=None):
+        with timed_render():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django с замером времени рендеринга для метрик."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template,
+                             self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template,
+                             self)
@@ -0,0 +1,739 @@
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import (OperationalError, connection, connections,
+                       reset_queries, transaction)
+from django.http import Http404
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.template import Template, Context, engines
+from django.template.loaders.filesystem import Loader
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, User
+from . import (auth, db, metrics, profiling, replicas, slow_queries,
+               staticfiles, warmup)
+from .views import PLAIN_MAX_AGE, static_view
+
+INDEX_LABELS = 'view="posts:index",method="GET"'
+
+
+def sample(text, name, labels):
+    """Значение строки метрики name{labels...} из текста /metrics."""
+    match = re.search(
+        rf'^{re.escape(name)}{{{re.escape(labels)}[^}}]*}} (\S+)$',
+        text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+@contextmanager
+def tracking(view):
+    """Относит запросы блока к view, как SlowQueryMiddleware."""
+    slow_queries._request.view = view
+    slow_queries._request.repeats = Counter()
+    try:
+        yield
+    finally:
+        slow_queries._request.__dict__.clear()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='MetricsDog')
+        Post.objects.create(text='Пост для метрик', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.guest_client = Client()
+
+    def scrape(self):
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_request_metrics_by_url_name(self):
+        """Для каждого имени URL считаются запросы, время, обращения
+        к базе, рендеринг шаблонов и размер ответа"""
+        response = self.guest_client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'yatube_requests_total',
+                                INDEX_LABELS + ',status="200"'), 1)
+        self.assertEqual(sample(text, 'yatube_request_duration_seconds_count',
+                                INDEX_LABELS), 1)
+        self.assertEqual(sample(text, 'yatube_db_queries_sum',
+                                INDEX_LABELS), 4)
+        self.assertGreater(sample(text, 'yatube_db_query_seconds_total',
+                                  INDEX_LABELS), 0)
+        self.assertGreater(sample(text, 'yatube_template_render_seconds_sum',
+                                  INDEX_LABELS), 0)
+        self.assertEqual(sample(text, 'yatube_response_size_bytes_sum',
+                                INDEX_LABELS), len(response.content))
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+
+    def test_streaming_response_size(self):
+        """Размер потокового ответа учитывается после отправки"""
+        response = self.guest_client.get(reverse('api:v1:index'))
+        size = len(b''.join(response.streaming_content))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'yatube_response_size_bytes_sum',
+                                'view="api:v1:index"'), size)
+
+    def test_metrics_are_not_public(self):
+        """Чужим адресам /metrics не отдается"""
+        response = self.guest_client.get(reverse('metrics'),
+                                         REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_metrics_summed_across_processes(self):
+        """Значения других процессов из METRICS_DIR складываются"""
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '1-1.json'), 'w') as stream:
+                json.dump([['yatube_requests_total',
+                            [['view', 'posts:index'], ['method', 'GET'],
+                             ['status', '200']], 5]], stream)
+            with override_settings(METRICS_DIR=directory):
+                self.guest_client.get(reverse('posts:index'))
+                text = self.scrape()
+                files = os.listdir(directory)
+        self.assertEqual(sample(text, 'yatube_requests_total',
+                                INDEX_LABELS + ',status="200"'), 6)
+        self.assertEqual(len(files), 2)
+
+    def test_dead_process_file_adopted(self):
+        """Файл завершившегося процесса переносится в файл текущего"""
+        finished = subprocess.Popen([sys.executable, '-c', ''])
+        finished.wait()
+        dead_file = f'{finished.pid}-1.json'
+        row = ['yatube_requests_total', [['view', 'finished']], 5]
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, dead_file), 'w') as stream:
+                json.dump([row], stream)
+            with override_settings(METRICS_DIR=directory):
+                first = self.scrape()
+                second = self.scrape()
+                files = os.listdir(directory)
+        for text in (first, second):
+            self.assertEqual(
+                sample(text, 'yatube_requests_total', 'view="finished"'), 5)
+        self.assertEqual(files, [metrics.process_file()])
+
+    def test_fork_starts_from_zero(self):
+        """После fork процесс пишет в свой файл и не повторяет
+        значения родителя"""
+        labels = (('view', 'forked'),)
+        metrics.inc('yatube_requests_total', labels)
+        parent_file = metrics.process_file()
+        with mock.patch.object(metrics.os, 'getpid',
+                               return_value=os.getpid() + 1):
+            metrics.forget_parent()
+            child_file = metrics.process_file()
+        self.assertNotEqual(child_file, parent_file)
+        self.assertTrue(child_file.startswith(f'{os.getpid() + 1}-'))
+        self.assertNotIn(('yatube_requests_total', labels),
+                         metrics.snapshot())
+
+    def test_thread_samples_merged(self):
+        """Значения, накопленные разными потоками, складываются"""
+        labels = (('view', 'threads'),)
+
+        def work():
+            for _ in range(1000):
+                metrics.inc('yatube_requests_total', labels)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            metrics.snapshot()[('yatube_requests_total', labels)], 4000)
+
+
+class ExceptionRecorder:
+    """Запоминает исключения, переданные в process_exception."""
+    seen = []
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        self.seen.append(type(exception))
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ProfiledDog')
+        cls.staff = User.objects.create_user(username='StaffDog',
+                                             is_staff=True)
+        Post.objects.create(text='Пост для профиля', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(PROFILING_DIR=self.directory,
+                                     PROFILING_SAMPLE_RATE=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def samples(self, view_name='posts:index'):
+        directory = profiling.sample_dir(view_name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.listdir(directory))
+
+    def test_staff_profiles_page_on_demand(self):
+        """Сотрудник снимает профиль страницы через ?profile"""
+        response = self.staff_client.get(reverse('posts:index'),
+                                         {'profile': ''})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        samples = self.samples()
+        self.assertEqual([name.rsplit('.', 1)[1] for name in samples],
+                         ['collapsed', 'prof'])
+        with open(os.path.join(profiling.sample_dir('posts:index'),
+                               samples[0])) as stream:
+            lines = stream.read().splitlines()
+        for line in lines:
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertTrue(any(';' in line for line in lines))
+
+    def test_template_response_render_is_profiled(self):
+        """Отложенный рендеринг TemplateResponse попадает в профиль"""
+        self.staff_client.get(reverse('about:tech'), {'profile': ''})
+        functions = profiling.top_functions(
+            profiling.recent_samples('about:tech'), limit=None)
+        self.assertTrue(any(row['function'].startswith('render ')
+                            for row in functions))
+
+    def test_view_errors_reach_process_exception(self):
+        """Ошибка профилируемого view проходит через process_exception
+        остальных middleware, а профиль сохраняется"""
+        ExceptionRecorder.seen.clear()
+        middleware = settings.MIDDLEWARE[:-1] + [
+            'core.tests.ExceptionRecorder', settings.MIDDLEWARE[-1]]
+        url = reverse('posts:post_detail', kwargs={'post_id': 0})
+        with override_settings(MIDDLEWARE=middleware):
+            client = Client()
+            client.force_login(self.staff)
+            response = client.get(url, {'profile': ''})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(ExceptionRecorder.seen, [Http404])
+        self.assertEqual(len(self.samples('posts:post_detail')), 2)
+
+    def test_regular_users_are_not_profiled(self):
+        """Без выборки обычный пользователь не профилируется"""
+        self.user_client.get(reverse('posts:index'), {'profile': ''})
+        self.assertEqual(self.samples(), [])
+
+    def test_sampled_requests_are_profiled(self):
+        """Запросы профилируются с долей PROFILING_SAMPLE_RATE"""
+        with override_settings(PROFILING_SAMPLE_RATE=1):
+            Client().get(reverse('posts:index'))
+        self.assertEqual(len(self.samples()), 2)
+
+    def test_profiling_page_for_staff_only(self):
+        """Страница профилей доступна только сотрудникам"""
+        self.staff_client.get(reverse('posts:index'), {'profile': ''})
+        response = self.staff_client.get(reverse('profiling'))
+        self.assertEqual(response.context['sample_count'], 1)
+        self.assertTrue(response.context['functions'])
+        response = self.user_client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='SlowDog')
+        cls.staff = User.objects.create_user(username='SlowStaffDog',
+                                             is_staff=True)
+        cls.post = Post.objects.create(text='Пост для журнала',
+                                       author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        slow_queries.recent.clear()
+        # журнал не пишется в файл SLOW_QUERY_LOG_FILE
+        handlers = mock.patch.object(slow_queries.logger, 'handlers',
+                                     [logging.NullHandler()])
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def test_slow_queries_attributed_to_view(self):
+        """Медленный запрос записывается с view и местом вызова"""
+        url = reverse('posts:profile', args=[self.user.username])
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('yatube.slow_queries') as logs:
+            Client().get(url)
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        self.assertTrue(entries)
+        self.assertEqual(list(slow_queries.recent), entries)
+        self.assertEqual({entry['view'] for entry in entries},
+                         {'posts.views.profile'})
+        self.assertTrue(all(entry['kind'] == slow_queries.SLOW
+                            and entry['duration'] >= 0
+                            for entry in entries))
+        sites = [entry['site'] for entry in entries]
+        self.assertTrue(any(re.fullmatch(r'posts/\S+\.py:\d+ in \w+', site)
+                            for site in sites))
+        self.assertTrue(any(re.fullmatch(r'\S+\.html:\d+', site)
+                            for site in sites))
+
+    def test_fast_queries_are_not_logged(self):
+        """Запросы быстрее порога в журнал не попадают"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=10_000):
+            Client().get(reverse('posts:index'))
+        self.assertEqual(list(slow_queries.recent), [])
+
+    def test_repeated_query_flagged_once(self):
+        """Запрос, повторенный в одном ответе, помечается как N+1"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=10_000,
+                               SLOW_QUERY_REPEAT_THRESHOLD=3), \
+                self.assertLogs('yatube.slow_queries'), \
+                tracking('posts.views.example'):
+            for _ in range(5):
+                Post.objects.filter(pk=self.post.pk).exists()
+        entries = list(slow_queries.recent)
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual(entry['kind'], slow_queries.REPEATED)
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(entry['view'], 'posts.views.example')
+        self.assertRegex(entry['site'],
+                         r'^core/tests\.py:\d+ in test_repeated_query')
+
+    def test_repeats_counted_per_response(self):
+        """Повторы из разных ответов не складываются"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=10_000,
+                               SLOW_QUERY_REPEAT_THRESHOLD=2):
+            for _ in range(2):
+                with tracking('posts.views.example'):
+                    Post.objects.filter(pk=self.post.pk).exists()
+        self.assertEqual(list(slow_queries.recent), [])
+
+    def test_slow_queries_page_for_staff_only(self):
+        """Журнал медленных запросов доступен только сотрудникам"""
+        client = Client()
+        client.force_login(self.staff)
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('yatube.slow_queries'):
+            client.get(reverse('posts:index'))
+        response = client.get(reverse('slow_queries'))
+        self.assertTrue(response.context['entries'])
+        client.force_login(self.user)
+        response = client.get(reverse('slow_queries'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class SqliteTuningTests(TransactionTestCase):
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        @db.retry_locked
+        def write():
+            calls.append(transaction.get_connection().in_atomic_block)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'done'
+        return write, calls
+
+    def test_pragmas_applied_to_connections(self):
+        """PRAGMA из SQLITE_PRAGMAS выполняются на новом соединении"""
+        # у базы тестов в памяти нет файла, поэтому mmap_size
+        # и journal_mode здесь не проверить
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0],
+                                 settings.SQLITE_PRAGMAS[name])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    @override_settings(DB_LOCK_BACKOFF_MS=0)
+    def test_locked_transaction_retried(self):
+        """Транзакция, получившая database is locked, повторяется"""
+        write, calls = self.flaky(failures=2)
+        self.assertEqual(write(), 'done')
+        self.assertEqual(calls, [True, True, True])
+
+    @override_settings(DB_LOCK_BACKOFF_MS=0, DB_LOCK_RETRIES=2)
+    def test_retries_are_limited(self):
+        """После DB_LOCK_RETRIES повторов ошибка пробрасывается"""
+        write, calls = self.flaky(failures=3)
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_not_retried(self):
+        """Прочие ошибки базы не повторяются"""
+        write, calls = self.flaky(failures=1, message='disk I/O error')
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+    def test_nested_transaction_not_retried(self):
+        """Блок внутри чужой транзакции не повторяется"""
+        write, calls = self.flaky(failures=1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class ReplicaTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        replicas._health.clear()
+        self.author = User.objects.create_user(username='ReplicaDog')
+        Post.objects.create(text='Пост с реплики', author=self.author)
+
+    def add_replica(self, alias, **options):
+        """Реплика — еще одно соединение с той же тестовой базой."""
+        connections.databases[alias] = {**connections.databases['default'],
+                                        **options}
+        connections.ensure_defaults(alias)
+        self.addCleanup(self.remove_replica, alias)
+        settings = override_settings(DATABASE_REPLICAS=[alias])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def remove_replica(self, alias):
+        connections[alias].close()
+        del connections.databases[alias]
+        delattr(connections._connections, alias)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты и страница поста читаются с реплики"""
+        self.add_replica('replica')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail',
+                    args=[Post.objects.get().pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connections['replica']) as reads, \
+                    CaptureQueriesContext(connection) as primary:
+                response = Client().get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertTrue(len(reads))
+            self.assertEqual(len(primary), 0)
+
+    def test_writer_reads_own_writes_from_primary(self):
+        """После записи пользователь читает с основной базы"""
+        self.add_replica('replica')
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Свежий пост'})
+        self.assertIn(replicas.PRIMARY_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections['replica']) as reads:
+            response = client.get(reverse('posts:index'))
+        self.assertEqual(len(reads), 0)
+        self.assertContains(response, 'Свежий пост')
+
+    def test_reads_without_writes_do_not_stick(self):
+        """Запрос без записи не переключает чтение на основную базу"""
+        self.add_replica('replica')
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn(replicas.PRIMARY_COOKIE, response.cookies)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """Недоступная реплика пропускается"""
+        self.add_replica('broken', NAME='/nonexistent/replica.sqlite3')
+        with CaptureQueriesContext(connection) as primary:
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(len(primary))
+        self.assertFalse(replicas._health['broken'][0])
+
+    def test_lagging_replica_does_not_poison_cache(self):
+        """Чтение с отстающей реплики не оставляет в кеше старых
+        страницы и карточки под ключами после правки"""
+        post = Post.objects.get()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        # снимок базы до правки — реплика, до которой правка не дошла
+        connection.ensure_connection()
+        snapshot = sqlite3.connect(path)
+        connection.connection.backup(snapshot)
+        snapshot.close()
+        self.add_replica('replica', NAME=path)
+        author = Client()
+        author.force_login(self.author)
+        author.post(reverse('posts:post_edit', args=[post.pk]),
+                    {'text': 'Исправленный пост'})
+        guest = Client()
+        response = guest.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост с реплики')
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = guest.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+        self.assertNotContains(response, 'Пост с реплики')
+
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    },
+}]
+
+
+class WarmupTests(TestCase):
+    def test_all_project_templates_compiled(self):
+        """Прогрев компилирует все шаблоны каталога templates"""
+        names = list(warmup.project_templates(settings.TEMPLATES_DIR))
+        self.assertIn('posts/index.html', names)
+        self.assertIn('includes/header.html', names)
+        self.assertEqual(warmup.warm_templates(), len(names))
+
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_warm_templates_served_from_cache(self):
+        """После прогрева шаблоны не читаются с диска"""
+        warmup.warm_templates()
+        engine, = engines.all()
+        with mock.patch.object(Loader, 'get_contents',
+                               side_effect=AssertionError):
+            engine.get_template('posts/index.html')
+            engine.get_template('includes/header.html')
+
+    def test_named_urls_reversed(self):
+        """Прогрев обращает именованные URL, в том числе с параметрами"""
+        names = dict(warmup.named_patterns(
+            warmup.get_resolver().url_patterns))
+        for name in ('posts:index', 'posts:post_detail', 'api:v1:profile',
+                     'admin:index'):
+            self.assertIn(name, names)
+        self.assertGreaterEqual(warmup.warm_urls(), len(
+            [name for name in names if not name.startswith('admin:')]))
+
+    def test_warmup_command(self):
+        """Команда warmup сообщает, сколько прогрето"""
+        out = StringIO()
+        call_command('warmup', stdout=out, stderr=StringIO())
+        self.assertRegex(out.getvalue(), r'Шаблонов: \d+, URL: \d+')
+
+
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CachedDog',
+                                            password='old-password')
+
+    def setUp(self):
+        cache.clear()
+        caches['sessions'].clear()
+        auth._users.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:post_create')
+        self.client.get(self.url)
+
+    def queries(self):
+        """Запросы к сессиям и пользователям при открытии страницы,
+        которая требует входа."""
+        # клиент сбрасывает журнал запросов в начале запроса
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        tables = ('"django_session"', '"auth_user"')
+        count = len([query for query in queries.captured_queries
+                     if any(table in query['sql'] for table in tables)])
+        return count, response
+
+    def test_cache_hit_skips_session_and_user_queries(self):
+        """Сессия и пользователь берутся из кеша без запросов к базе"""
+        count, response = self.queries()
+        self.assertEqual(count, 0)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_save_drops_cached_user(self):
+        """Сохранение пользователя сбрасывает его кеш"""
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое имя'
+        user.save()
+        count, response = self.queries()
+        self.assertEqual(count, 1)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_ends_cached_sessions(self):
+        """После смены пароля старая сессия больше не действует"""
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_sessions_not_evicted_by_page_cache(self):
+        """Заполнение основного кеша не вытесняет сессии"""
+        max_entries = settings.CACHE_MAX_ENTRIES['default']
+        cache.set_many({f'filler:{i}': i for i in range(max_entries + 1)})
+        auth._users.clear()
+        count, _ = self.queries()
+        self.assertEqual(count, 1)
+
+    @override_settings(USER_CACHE_SIZE=2)
+    def test_user_cache_is_bounded(self):
+        """Кеш пользователей не растет больше USER_CACHE_SIZE,
+        вытесняется давно запрошенный"""
+        others = [User.objects.create_user(username=f'Bounded{i}')
+                  for i in range(2)]
+        for user in others:
+            client = Client()
+            client.force_login(user)
+            client.get(self.url)
+        self.assertEqual(list(auth._users),
+                         [str(user.pk) for user in others])
+        count, _ = self.queries()
+        self.assertEqual(count, 1)
+        self.assertEqual(len(auth._users), 2)
+
+    @override_settings(USER_CACHE_SECONDS=0)
+    def test_user_cache_can_be_disabled(self):
+        """При USER_CACHE_SECONDS=0 пользователь читается из базы"""
+        count, _ = self.queries()
+        self.assertEqual(count, 1)
+
+
+def make_png(raw, text=b'Comment\x00made by hand'):
+    """PNG в оттенках серого 8x2 со слабо сжатыми данными в двух IDAT."""
+    packed = zlib.compress(raw, 0)
+    middle = len(packed) // 2
+    return b''.join([
+        staticfiles.PNG_SIGNATURE,
+        staticfiles.png_chunk(b'IHDR', bytes.fromhex('00000008000000020800'
+                                                     '000000')),
+        staticfiles.png_chunk(b'tEXt', text),
+        staticfiles.png_chunk(b'IDAT', packed[:middle]),
+        staticfiles.png_chunk(b'IDAT', packed[middle:]),
+        staticfiles.png_chunk(b'IEND', b''),
+    ])
+
+
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(
+            STATIC_ROOT=cls.root.name,
+            STATICFILES_STORAGE='core.staticfiles.'
+                                'PrecompressedManifestStorage')
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.css = staticfiles_storage.stored_name(
+            'css/bootstrap.min.css')
+
+    def get(self, path, **headers):
+        return static_view(self.factory.get('/static/' + path, **headers),
+                           path)
+
+    def test_static_tag_uses_hashed_names(self):
+        """{% static %} выдает имя с хешем содержимого"""
+        self.assertRegex(self.css, r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        html = Template("{% load static %}{% static 'css/bootstrap.min.css' %}"
+                        ).render(Context())
+        self.assertEqual(html, settings.STATIC_URL + self.css)
+
+    def test_compressed_copy_matches_original(self):
+        """Рядом с файлом с хешем лежит его gzip-копия"""
+        path = os.path.join(self.root.name, self.css)
+        with open(path, 'rb') as original, \
+                gzip.open(path + '.gz', 'rb') as packed:
+            self.assertEqual(packed.read(), original.read())
+
+    def test_png_optimized_without_loss(self):
+        """PNG пережимается в один IDAT без текстовых чанков,
+        а пиксели не меняются"""
+        raw = b''.join(b'\x00' + bytes(range(8)) for _ in range(2))
+        data = make_png(raw)
+        optimized = staticfiles.optimize_png(data)
+        self.assertLess(len(optimized), len(data))
+        chunks = list(staticfiles.png_chunks(optimized))
+        kinds = [kind for kind, _ in chunks]
+        self.assertEqual(kinds, [b'IHDR', b'IDAT', b'IEND'])
+        self.assertEqual(zlib.decompress(chunks[1][1]), raw)
+        self.assertIs(staticfiles.optimize_png(b'not a png'), b'not a png')
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        """Файл с хешем отдается сжатым и кешируется навсегда"""
+        response = self.get(self.css, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+
+    def test_plain_name_served_uncompressed_briefly(self):
+        """Файл без хеша кешируется ненадолго, без Accept-Encoding
+        отдается несжатым"""
+        response = self.get('css/bootstrap.min.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn(f'max-age={PLAIN_MAX_AGE}', response['Cache-Control'])
+        response.close()
+
+    def test_not_modified_and_missing(self):
+        """Неизмененный файл — 304, чужой путь и отсутствующий — 404"""
+        response = self.get(self.css)
+        last_modified = response['Last-Modified']
+        response.close()
+        response = self.get(self.css, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        for path in ('../settings.py', 'css/missing.css', 'css/'):
+            with self.assertRaises(Http404):
+                self.get(path)
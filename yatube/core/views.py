@@ -0,0 +1,104 @@
+import mimetypes
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, HttpResponseNotModified)
+from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from . import metrics, profiling, slow_queries
+from .staticfiles import negotiate
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROFILE_SORTS = ('cumulative', 'tottime', 'calls')
+# файлы с хешем в имени не меняются, остальные перепроверяются
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+PLAIN_MAX_AGE = 60
+
+
+def metrics_view(request):
+    """Метрики всех процессов в формате Prometheus. Доступны
+    сотрудникам и адресам из METRICS_ALLOWED_IPS."""
+    allowed = settings.METRICS_ALLOWED_IPS
+    if (not request.user.is_staff
+            and request.META.get('REMOTE_ADDR') not in allowed):
+        return HttpResponseForbidden()
+    metrics.flush(force=True)
+    return HttpResponse(metrics.render(metrics.collect()),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@staff_member_required
+def profiling_view(request):
+    """Самые дорогие функции по последним профилям запросов."""
+    view_name = request.GET.get('view') or None
+    sort = request.GET.get('sort')
+    if sort not in PROFILE_SORTS:
+        sort = PROFILE_SORTS[0]
+    samples = profiling.recent_samples(view_name)
+    by_view = Counter(os.path.basename(os.path.dirname(path))
+                      for path in profiling.recent_samples())
+    context = {
+        'view_name': view_name,
+        'sort': sort,
+        'sorts': PROFILE_SORTS,
+        'sample_count': len(samples),
+        'views': sorted(by_view.items()),
+        'functions': profiling.top_functions(samples, sort),
+        'profiling_dir': settings.PROFILING_DIR,
+    }
+    return render(request, 'core/profiling.html', context)
+
+
+@staff_member_required
+def slow_queries_view(request):
+    """Последние медленные и повторяющиеся запросы этого процесса."""
+    context = {
+        'entries': list(reversed(slow_queries.recent)),
+        'threshold': settings.SLOW_QUERY_THRESHOLD_MS,
+        'repeat_threshold': settings.SLOW_QUERY_REPEAT_THRESHOLD,
+        'log_file': settings.SLOW_QUERY_LOG_FILE,
+    }
+    return render(request, 'core/slow_queries.html', context)
+
+
+@require_safe
+def static_view(request, path):
+    """Статика из STATIC_ROOT без отдельного веб-сервера: сжатая копия
+    по Accept-Encoding, для имен с хешем — кеш навсегда."""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+    served_path, encoding = negotiate(
+        full_path, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(open(served_path, 'rb'),
+                            content_type=content_type
+                            or 'application/octet-stream')
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+    if is_hashed is not None and is_hashed(path):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=IMMUTABLE_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=PLAIN_MAX_AGE)
+    return response
@@ -0,0 +1,101 @@
+"""Прогрев процесса до приема запросов.
+
+Компилирует все шаблоны из каталогов DIRS, обращает все именованные
+URL и читает манифест статики: разбор шаблонов попадает в кеш
+загрузчика (TEMPLATE_CACHE), URLconf импортируется и компилирует
+регулярные выражения, а {% static %} находит имена с хешем уже
+на первом запросе воркера.
+"""
+import os
+import time
+import uuid
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+from django.urls.converters import IntConverter, UUIDConverter
+
+TEMPLATE_SUFFIXES = ('.html', '.txt')
+
+
+def project_templates(directory):
+    """Имена шаблонов относительно каталога directory."""
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(TEMPLATE_SUFFIXES):
+                path = os.path.relpath(os.path.join(root, filename),
+                                       directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    """Компилирует шаблоны каталогов DIRS, возвращает их число."""
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.engine.dirs:
+            for name in project_templates(directory):
+                engine.get_template(name)
+                count += 1
+    return count
+
+
+def sample_value(converter):
+    if isinstance(converter, IntConverter):
+        return 1
+    if isinstance(converter, UUIDConverter):
+        return uuid.UUID(int=0)
+    return 'warmup'
+
+
+def named_patterns(patterns, namespace='', converters=None):
+    """Пары (полное имя URL, конвертеры его параметров)."""
+    converters = converters or {}
+    for pattern in patterns:
+        own = {**converters,
+               **getattr(pattern.pattern, 'converters', {})}
+        if isinstance(pattern, URLResolver):
+            prefix = (f'{namespace}{pattern.namespace}:'
+                      if pattern.namespace else namespace)
+            yield from named_patterns(pattern.url_patterns, prefix, own)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}', own
+
+
+def warm_urls():
+    """Обращает все именованные URL, возвращает число обращенных.
+
+    Адреса с параметрами-регулярками (например, в админке)
+    пропускаются: для заполнения кешей резолвера хватает остальных.
+    """
+    count = 0
+    for name, converters in named_patterns(get_resolver().url_patterns):
+        kwargs = {key: sample_value(converter)
+                  for key, converter in converters.items()}
+        try:
+            reverse(name, kwargs=kwargs)
+        except NoReverseMatch:
+            continue
+        count += 1
+    return count
+
+
+def warm_static():
+    """Загружает манифест статики, возвращает число имен в нем."""
+    return len(getattr(staticfiles_storage, 'hashed_files', ()))
+
+
+def warmup():
+    """Прогревает шаблоны, URL и статику, возвращает сводку для отчета."""
+    start = time.perf_counter()
+    templates = warm_templates()
+    urls = warm_urls()
+    static = warm_static()
+    return {
+        'templates': templates,
+        'urls': urls,
+        'static': static,
+        'seconds': time.perf_counter() - start,
+    }
@@ -1,15 +1,61 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .models import Follow, Group, Post
+from .paginators import CachedCountPaginator
+from .search import matching_ids, to_match
+from .widgets import PreloadedAutocompleteSelect, PreloadedGroupForm
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    # выбор группы подгружается по мере ввода, а не рендерит
+    # все группы в каждой строке
+    autocomplete_fields = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    # сортировка только по колонкам, покрытым индексами
+    sortable_by = ('pk', 'pub_date')
+    paginator = CachedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PreloadedGroupForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту идет через полнотекстовый индекс,
+        а не через LIKE по всей таблице."""
+        match = to_match(search_term)
+        if match is None:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(match)), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('^slug', '^title')
+    ordering = ('title', 'pk')
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
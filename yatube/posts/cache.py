@@ -0,0 +1,267 @@
+import hashlib
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+
+from core.replicas import reading_from_replica
+from .models import FeedVersion
+
+CARD_VARIANTS = ('index', 'group_list', 'profile')
+CARD_TEMPLATE = 'includes/cards/{variant}.html'
+CARD_TIMEOUT = 60 * 60 * 24
+INVALIDATE_CHUNK = 500
+
+card_stats = Counter()
+
+
+def card_scopes(post):
+    """Области версий автора и группы, которые выводятся в карточке.
+
+    Привязаны к id, а не к username и slug: при переименовании
+    меняется версия, а не имя области.
+    """
+    scopes = [f'cards:author:{post.author_id}']
+    if post.group_id is not None:
+        scopes.append(f'cards:group:{post.group_id}')
+    return scopes
+
+
+def card_versions(posts):
+    """Версии авторов и групп карточек одним запросом по ключу."""
+    scopes = {scope for post in posts for scope in card_scopes(post)}
+    if not scopes:
+        return {}
+    return dict(FeedVersion.objects.filter(scope__in=scopes)
+                .values_list('scope', 'version'))
+
+
+def card_key(variant, post, versions):
+    """Ключ фрагмента карточки поста.
+
+    Момент последнего изменения служит штампом версии строки: после
+    правки карточка получает новый ключ, и реплика, еще не получившая
+    правку, не вернет в кеш старый текст под ключом нового. Если id
+    поста будет переиспользован, старый фрагмент тоже не подойдет.
+    Версии автора и группы из versions (card_versions) меняют ключ
+    после их правки, и карточки всех их постов не приходится
+    удалять по одной.
+    """
+    stamps = [int(post.modified.timestamp() * 1_000_000)]
+    stamps.extend(versions.get(scope, 0) for scope in card_scopes(post))
+    return f'post_card:{variant}:{post.pk}:{".".join(map(str, stamps))}'
+
+
+def render_cards(posts, variant):
+    """Возвращает HTML карточек постов одним обращением к кешу.
+
+    Отсутствующие в кеше карточки рендерятся и сохраняются
+    одним set_many.
+    """
+    posts = list(posts)
+    versions = card_versions(posts)
+    keys = [card_key(variant, post, versions) for post in posts]
+    cached = cache.get_many(keys)
+    missing = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(CARD_TEMPLATE.format(variant=variant),
+                                    {'post': post})
+            missing[key] = card
+        cards.append(mark_safe(card))
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    card_stats['hits'] += len(cached)
+    card_stats['misses'] += len(missing)
+    return cards
+
+
+def invalidate_posts(posts):
+    """Удаляет фрагменты карточек для переданных постов."""
+    versions = card_versions(posts)
+    cache.delete_many([
+        card_key(variant, post, versions)
+        for post in posts
+        for variant in CARD_VARIANTS
+    ])
+
+
+PAGE_TIMEOUT = 60 * 5
+COUNT_TIMEOUT = 60 * 60
+PAGE_PARAMS = ('page', 'cursor')
+GLOBAL_SCOPE = 'all'
+
+
+def count_key(scope):
+    return f'post_count:{scope}'
+
+
+def drop_cached_counts(*scopes):
+    """Сбрасывает закешированные числа постов лент после записи."""
+    cache.delete_many([count_key(scope) for scope in scopes])
+
+
+def bump_page_versions(*scopes):
+    """Делает недействительными закешированные страницы областей
+    и валидаторы условных запросов к ним.
+
+    Версия — отметка времени, а не счетчик, и хранится в базе
+    (FeedVersion), а не в кеше процесса: ключи страниц, ETag
+    и Last-Modified одинаковы во всех процессах, и запись в любом
+    из них сбрасывает их для всех. Если строки всех областей уже
+    есть, запись стоит одного UPDATE на INVALIDATE_CHUNK областей.
+    """
+    version = time.time_ns()
+    scopes = list(scopes)
+    for start in range(0, len(scopes), INVALIDATE_CHUNK):
+        chunk = scopes[start:start + INVALIDATE_CHUNK]
+        updated = FeedVersion.objects.filter(scope__in=chunk).update(
+            version=version)
+        if updated < len(chunk):
+            FeedVersion.objects.bulk_create(
+                [FeedVersion(scope=scope, version=version)
+                 for scope in chunk],
+                ignore_conflicts=True)
+
+
+def related_scopes(username, group_slug=None):
+    """Области автора и группы поста: их имена выводятся рядом
+    с постом, и их правка меняет страницу поста."""
+    scopes = [f'profile:{username}']
+    if group_slug is not None:
+        scopes.append(f'group:{group_slug}')
+    return scopes
+
+
+def scope_versions(request, *scopes):
+    """Текущие версии областей и глобальная версия.
+
+    Читаются одним запросом по первичному ключу и запоминаются
+    до конца запроса: их спрашивают и кеш страниц, и валидаторы.
+    Область, в которую еще не писали, имеет версию 0.
+    """
+    memo = request.__dict__.setdefault('feed_versions', {})
+    if scopes not in memo:
+        names = (*scopes, GLOBAL_SCOPE)
+        stored = dict(FeedVersion.objects.filter(scope__in=names)
+                      .values_list('scope', 'version'))
+        memo[scopes] = [stored.get(name, 0) for name in names]
+    return memo[scopes]
+
+
+def scope_stamp(request, *scopes):
+    """Текущие версии областей и глобальная версия одной строкой.
+
+    Меняется при любой записи, затрагивающей области, поэтому годится
+    и для ключей кеша, и как валидатор ETag.
+    """
+    return '.'.join(map(str, scope_versions(request, *scopes)))
+
+
+def scope_changed_at(request, *scopes):
+    """Момент последней записи, затронувшей области."""
+    return datetime.fromtimestamp(
+        max(scope_versions(request, *scopes)) / 1e9, tz=dt_timezone.utc)
+
+
+def params_digest(request, names):
+    params = '&'.join(f'{name}={request.GET.get(name, "")}'
+                      for name in names)
+    return hashlib.md5(params.encode()).hexdigest()
+
+
+def page_key(scope, request):
+    stamp = scope_stamp(request, scope)
+    params = params_digest(request, PAGE_PARAMS)
+    return f'page:{scope}:{stamp}:{params}'
+
+
+def anonymous_page_cache(scope):
+    """Кеширует страницу целиком для анонимных посетителей.
+
+    scope — шаблон области кеша, например 'group:{slug}', заполняется
+    аргументами view. Авторизованные пользователи видят в шапке свое
+    имя, поэтому для них страница всегда рендерится заново. Страница,
+    прочитанная с реплики, не сохраняется: реплика может отставать
+    от основной базы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = page_key(scope.format(**kwargs), request)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if (response.status_code == HTTPStatus.OK
+                    and not reading_from_replica()):
+                cache.set(key, (response.content, response['Content-Type']),
+                          PAGE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def viewer(request):
+    """Страницы отличаются шапкой для вошедшего пользователя."""
+    return str(request.user.pk) if request.user.is_authenticated else ''
+
+
+def conditional_page(scope, last_modified=None, related=None):
+    """Отвечает 304 на If-None-Match и If-Modified-Since, не вызывая view.
+
+    ETag строится по версии области scope, пользователю и параметрам
+    страницы, Last-Modified — по моменту последней записи в область
+    или, если передан, по более позднему из него и last_modified(request,
+    **kwargs). related(request, **kwargs) добавляет области, от которых
+    страница тоже зависит; их версии читаются тем же запросом. Версии
+    общие для всех процессов, поэтому ответ 304 одного воркера совпадает
+    с ответом другого. Ответы помечаются no-cache: браузер обязан
+    каждый раз проверять их, а не показывать устаревшую ленту.
+    """
+    def scopes(request, kwargs):
+        names = [scope.format(**kwargs)]
+        if related is not None:
+            names.extend(related(request, **kwargs))
+        return names
+
+    def etag(request, **kwargs):
+        names = scopes(request, kwargs)
+        raw = (f'{",".join(names)}|{scope_stamp(request, *names)}|'
+               f'{viewer(request)}|{params_digest(request, PAGE_PARAMS)}')
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def modified(request, **kwargs):
+        changed = scope_changed_at(request, *scopes(request, kwargs))
+        if last_modified is not None:
+            own = last_modified(request, **kwargs)
+            if own is not None:
+                changed = max(changed, own)
+        return changed
+
+    def decorator(view):
+        conditional = condition(etag_func=etag,
+                                last_modified_func=modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,27 @@
+from django.core.checks import Warning, register
+from django.db import DatabaseError
+
+from .models import PostImport
+
+
+@register()
+def unfinished_imports(app_configs, **kwargs):
+    """Незавершенная загрузка import_posts: загруженные посты уже
+    видны в лентах и поиске, но счетчики постов авторов и групп
+    пересчитываются только при ее завершении."""
+    try:
+        names = list(PostImport.objects.values_list('name', flat=True))
+    except DatabaseError:
+        # база еще не создана или не мигрирована
+        return []
+    return [
+        Warning(
+            f'Загрузка постов {name!r} не завершена, счетчики постов '
+            f'авторов и групп не пересчитаны.',
+            hint=f'Продолжите ее: manage.py import_posts --name {name!r} '
+                 f'<файл>.',
+            obj=PostImport,
+            id='posts.W001',
+        )
+        for name in names
+    ]
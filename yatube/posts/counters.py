@@ -0,0 +1,69 @@
+from django.db.models import Count, F
+
+from users.models import Profile
+from .models import Group, Post, User
+
+BATCH_SIZE = 500
+
+
+def adjust_post_counters(author_id, group_id, delta):
+    """Сдвигает счетчики постов автора и группы на delta.
+
+    Обновление идет одним UPDATE через F(), без чтения строк,
+    поэтому параллельные записи не теряют изменений. Счетчик
+    не уходит ниже нуля, даже если успел разойтись с данными.
+    """
+    guard = {'posts_count__gte': -delta} if delta < 0 else {}
+    if author_id is not None:
+        Profile.objects.filter(user_id=author_id, **guard).update(
+            posts_count=F('posts_count') + delta)
+    if group_id is not None:
+        Group.objects.filter(pk=group_id, **guard).update(
+            posts_count=F('posts_count') + delta)
+
+
+def adjust_followers_count(author_id, delta):
+    """Сдвигает счетчик подписчиков автора на delta, как
+    adjust_post_counters."""
+    guard = {'followers_count__gte': -delta} if delta < 0 else {}
+    Profile.objects.filter(user_id=author_id, **guard).update(
+        followers_count=F('followers_count') + delta)
+
+
+def _drifted(model, field, actual):
+    attname = model._meta.get_field(field).attname
+    for obj in model.objects.only(field, 'posts_count').iterator():
+        count = actual.get(getattr(obj, attname), 0)
+        if obj.posts_count != count:
+            yield obj, obj.posts_count, count
+
+
+def rebuild_post_counters(fix=True):
+    """Пересчитывает счетчики постов по таблице постов.
+
+    Возвращает список расхождений (объект, было, стало); при fix=True
+    исправляет их пачками и создает недостающие профили.
+    """
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    if fix:
+        Profile.objects.bulk_create(
+            (Profile(user_id=pk) for pk in missing.iterator()),
+            batch_size=BATCH_SIZE,
+        )
+    by_author = dict(Post.objects.order_by().values_list('author')
+                     .annotate(Count('pk')))
+    by_group = dict(Post.objects.order_by().exclude(group=None)
+                    .values_list('group').annotate(Count('pk')))
+    drift = []
+    for model, field, actual in ((Profile, 'user', by_author),
+                                 (Group, 'id', by_group)):
+        changed = []
+        for obj, stored, count in _drifted(model, field, actual):
+            drift.append((obj, stored, count))
+            obj.posts_count = count
+            changed.append(obj)
+        if fix and changed:
+            model.objects.bulk_update(changed, ['posts_count'],
+                                      batch_size=BATCH_SIZE)
+    return drift
@@ -0,0 +1,86 @@
+"""Формат выгрузки постов и групп для команд export_posts и import_posts."""
+import csv
+import gzip
+import io
+import json
+import sys
+from contextlib import contextmanager
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+FORMATS = ('ndjson', 'csv')
+# поля строки выгрузки и колонки, из которых они читаются
+POST_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+POST_COLUMNS = ('id', 'text', 'pub_date', 'author__username', 'group__slug')
+GROUP_FIELDS = ('slug', 'title', 'description')
+STDIO = '-'
+
+
+@contextmanager
+def open_output(path, compress=False, stdout=None):
+    """Текстовый поток для записи: файл или stdout, при compress —
+    сжатый gzip на лету.
+
+    stdout — поток вывода команды, по умолчанию sys.stdout. Он только
+    одалживается: по выходе обертка над ним отсоединяется, а не
+    закрывается, и поток остается рабочим для print и следующих команд.
+    """
+    if path != STDIO:
+        opener = gzip.open if compress else open
+        with opener(path, 'wt', encoding='utf-8', newline='') as stream:
+            yield stream
+        return
+    stdout = stdout or sys.stdout
+    buffer = getattr(stdout, 'buffer', None)
+    if buffer is None:
+        # текстовый поток без байтового буфера, например StringIO
+        if compress:
+            raise ValueError('Сжатый вывод требует байтового stdout')
+        yield stdout
+        return
+    stdout.flush()
+    raw = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+    stream = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        stream.detach()
+        if compress:
+            # дописывает конец архива, сам stdout не закрывает
+            raw.close()
+        buffer.flush()
+
+
+def open_input(path):
+    """Текстовый поток для чтения: файл или stdin. Сжатие gzip
+    распознается по сигнатуре, а не по расширению."""
+    raw = sys.stdin.buffer if path == STDIO else open(path, 'rb')
+    if raw.peek(2)[:2] == b'\x1f\x8b':
+        raw = gzip.GzipFile(fileobj=raw, mode='rb')
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def read_rows(stream, input_format):
+    """Строки выгрузки как словари, по одной, без чтения всего файла."""
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_moment(value):
+    """Дата или дата со временем из аргумента командной строки."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Не удалось разобрать дату: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
@@ -1,6 +1,7 @@
 from django.forms import ModelForm
 
 from .models import Post
+from .widgets import GroupLookupSelect
 
 
 class PostForm(ModelForm):
@@ -8,10 +9,15 @@ class PostForm(ModelForm):
         model = Post
         labels = {
             'group': 'Группа',
-            'text': 'Сообщение'
+            'text': 'Сообщение',
+            'image': 'Картинка'
         }
         help_texts = {
             'group': 'Выберите группу',
-            'text': 'Введите ссообщение'
+            'text': 'Введите ссообщение',
+            'image': 'Миниатюры появятся через несколько секунд'
+        }
+        fields = ['text', 'group', 'image']
+        widgets = {
+            'group': GroupLookupSelect,
         }
-        fields = ['text', 'group']
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from core.benchmark import User, measure, rollback_afterwards
+from posts.counters import rebuild_post_counters
+from posts.models import Group, Post
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность HTML-лент '
+            'и JSON API на тех же данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=10,
+                            help='постов на странице API')
+
+    def handle(self, *args, **options):
+        with rollback_afterwards():
+            author, group = self.fill(options['posts'])
+            self.run(author, group, options['repeat'], options['limit'])
+
+    def fill(self, count):
+        author = User.objects.create(username='bench_api')
+        group = Group.objects.create(title='bench_api', slug='bench-api')
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {i}', author=author, group=group)
+             for i in range(count)),
+            batch_size=500,
+        )
+        rebuild_post_counters()
+        return author, group
+
+    def run(self, author, group, repeat, limit):
+        client = Client()
+        feeds = (
+            ('index', {}, {}),
+            ('group_list', {'slug': group.slug}, {}),
+            ('profile', {'username': author.username}, {}),
+        )
+        self.stdout.write(f'{"feed":>12} {"HTML req/s":>12} '
+                          f'{"API req/s":>12} {"API 304 req/s":>14}')
+        for name, kwargs, _ in feeds:
+            html_url = reverse(f'posts:{name}', kwargs=kwargs)
+            api_url = reverse(f'api:v1:{name}', kwargs=kwargs)
+
+            def html():
+                # страничный кеш сравнивал бы кеш с кешем, а не рендеринг
+                cache.clear()
+                client.get(html_url).content
+
+            def api():
+                cache.clear()
+                b''.join(client.get(api_url, {'limit': limit})
+                         .streaming_content)
+
+            etag = client.get(api_url, {'limit': limit})['ETag']
+
+            def not_modified():
+                client.get(api_url, {'limit': limit},
+                           HTTP_IF_NONE_MATCH=etag)
+
+            rates = [1000 / measure(func, repeat)['p50']
+                     for func in (html, api, not_modified)]
+            self.stdout.write(f'{name:>12} {rates[0]:>12.0f} '
+                              f'{rates[1]:>12.0f} {rates[2]:>14.0f}')
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.benchmark import User, rollback_afterwards
+from posts.models import Group, Post
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+AUTHORS = 1_000
+GROUPS = 100
+# построчная вставка медленная, ее скорость меряется на части строк
+ROW_BY_ROW_SAMPLE = 5_000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость загрузки постов по одному через '
+            'Post.objects.create и командой import_posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500_000)
+        parser.add_argument('--batch-size', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            self.write(path, options['posts'])
+            with rollback_afterwards():
+                self.row_by_row(path)
+            with rollback_afterwards():
+                self.bulk(path, options['posts'], options['batch_size'])
+
+    def write(self, path, count):
+        with open(path, 'w', encoding='utf-8') as stream:
+            for i in range(count):
+                stream.write(json.dumps({
+                    'text': f'Загруженный пост номер {i}',
+                    'pub_date': (START + timedelta(seconds=i)).isoformat(),
+                    'author': f'bench_import_{i % AUTHORS}',
+                    'group': f'bench-import-{i % GROUPS}',
+                }, ensure_ascii=False) + '\n')
+
+    def row_by_row(self, path):
+        authors = {}
+        groups = {}
+        started = time.perf_counter()
+        with open(path, encoding='utf-8') as stream:
+            for _, line in zip(range(ROW_BY_ROW_SAMPLE), stream):
+                row = json.loads(line)
+                if row['author'] not in authors:
+                    authors[row['author']] = User.objects.create(
+                        username=row['author'])
+                if row['group'] not in groups:
+                    groups[row['group']] = Group.objects.create(
+                        slug=row['group'], title=row['group'])
+                Post.objects.create(text=row['text'],
+                                    author=authors[row['author']],
+                                    group=groups[row['group']])
+        self.report('Post.objects.create', ROW_BY_ROW_SAMPLE, started)
+
+    def bulk(self, path, count, batch_size):
+        started = time.perf_counter()
+        call_command('import_posts', path, batch_size=batch_size,
+                     stdout=StringIO())
+        self.report('import_posts', count, started)
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:>32}: {count} постов за {elapsed:.1f} с, '
+                          f'{count / elapsed:,.0f} постов/с')
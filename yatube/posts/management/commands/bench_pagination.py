@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core.benchmark import User, measure, rollback_afterwards
+from posts.models import Post
+from posts.paginators import CursorPaginator, encode_cursor
+from posts.views import TEN_ENTRIES
+
+DEPTHS = (1, 100, 10_000)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ?page=N и курсорную пагинацию ленты '
+            'на глубине 1, 100 и 10 000 страниц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int,
+                            default=DEPTHS[-1] * TEN_ENTRIES + 1)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rollback_afterwards():
+            self.fill(options['posts'])
+            self.run(options['repeat'])
+
+    def fill(self, count):
+        author = User.objects.create(username='bench_pagination')
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {i}', author=author) for i in range(count)),
+            batch_size=500,
+        )
+
+    def run(self, repeat):
+        queryset = Post.objects.all()
+        total = queryset.count()
+        self.stdout.write(f'{"depth":>8} {"offset p50":>12} '
+                          f'{"cursor p50":>12}  (ms, {total} posts)')
+        for depth in DEPTHS:
+            if (depth - 1) * TEN_ENTRIES >= total:
+                self.stdout.write(f'{depth:>8}  пропущено: мало постов')
+                continue
+            token = None
+            if depth > 1:
+                anchor = queryset[(depth - 1) * TEN_ENTRIES - 1]
+                token = encode_cursor(anchor)
+            offset = measure(lambda: list(
+                Paginator(queryset, TEN_ENTRIES).get_page(depth)), repeat)
+            cursor = measure(lambda: list(
+                CursorPaginator(queryset, TEN_ENTRIES).get_page(token)),
+                repeat)
+            self.stdout.write(f'{depth:>8} {offset["p50"]:>12.2f} '
+                              f'{cursor["p50"]:>12.2f}')
@@ -0,0 +1,63 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import User, measure, rollback_afterwards
+from posts.models import Post
+from posts.search import SearchResults
+from posts.views import TEN_ENTRIES
+
+WORDS = (
+    'кот', 'пес', 'дом', 'лес', 'река', 'город', 'утро', 'вечер', 'зима',
+    'лето', 'книга', 'песня', 'друг', 'дорога', 'море', 'небо', 'солнце',
+    'дождь', 'ветер', 'снег', 'поезд', 'чай', 'кофе', 'сад', 'окно',
+)
+RARE_WORD = 'тромбон'
+POST_WORDS = 30
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по тексту постов через LIKE '
+            'и через полнотекстовый индекс FTS5.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rollback_afterwards():
+            self.fill(options['posts'])
+            self.run(options['repeat'])
+
+    def fill(self, count):
+        author = User.objects.create(username='bench_search')
+        rnd = random.Random(0)
+
+        def text(i):
+            words = rnd.choices(WORDS, k=POST_WORDS)
+            if i % 1000 == 0:
+                words[rnd.randrange(POST_WORDS)] = RARE_WORD
+            return ' '.join(words)
+
+        Post.objects.bulk_create(
+            (Post(text=text(i), author=author) for i in range(count)),
+            batch_size=500,
+        )
+
+    def run(self, repeat):
+        total = Post.objects.count()
+        self.stdout.write(f'{"query":>10} {"LIKE p50":>12} '
+                          f'{"FTS5 p50":>12}  (ms, {total} posts)')
+        for word in (RARE_WORD, WORDS[0]):
+            like = measure(lambda: self.like_page(word), repeat)
+            fts = measure(lambda: self.fts_page(word), repeat)
+            self.stdout.write(f'{word:>10} {like["p50"]:>12.2f} '
+                              f'{fts["p50"]:>12.2f}')
+
+    def like_page(self, word):
+        queryset = Post.objects.filter(text__icontains=word)
+        return queryset.count(), list(queryset[:TEN_ENTRIES])
+
+    def fts_page(self, word):
+        results = SearchResults(word)
+        return results.count(), results[:TEN_ENTRIES]
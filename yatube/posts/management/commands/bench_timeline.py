@@ -0,0 +1,114 @@
+import random
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.benchmark import User, measure, rollback_afterwards
+from posts.management.commands.seed import zipf_cum_weights
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import TimelinePaginator, fan_out, rebuild_timelines
+from posts.views import TEN_ENTRIES
+from users.models import Profile
+
+# без порога раздаются все посты: чистая раздача при записи
+NO_LIMIT = 10 ** 9
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок через IN-запрос по постам, '
+            'чистую раздачу при записи и смешанную схему с подмешиванием '
+            'популярных авторов при чтении. Подписки распределены '
+            'по закону Ципфа: немногие авторы собирают большую часть '
+            'подписчиков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--readers', type=int, default=1_000)
+        parser.add_argument('--follows', type=int, default=30,
+                            help='подписок у читателя')
+        parser.add_argument('--posts', type=int, default=10,
+                            help='постов у автора')
+        parser.add_argument('--limit', type=int, default=200,
+                            help='TIMELINE_FANOUT_LIMIT смешанной схемы')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with rollback_afterwards():
+            authors, readers = self.fill(options)
+            counts = Follow.objects.filter(author__in=authors[:1]).count()
+            self.stdout.write(
+                f'{len(authors)} авторов, {len(readers)} читателей, '
+                f'у самого популярного автора {counts} подписчиков')
+            self.stdout.write(
+                f'{"schema":<10} {"entries":>8} {"read p50":>9} '
+                f'{"read max":>9} {"write top":>10} {"write p50":>10}  '
+                f'(мс)')
+            self.naive(readers, options['repeat'])
+            for schema, limit in (('fan-out', NO_LIMIT),
+                                  ('hybrid', options['limit'])):
+                with override_settings(TIMELINE_FANOUT_LIMIT=limit):
+                    self.run(schema, authors, readers, options['repeat'])
+
+    def users(self, prefix, count):
+        # SQLite не возвращает id из bulk_create: пользователи
+        # перечитываются
+        User.objects.bulk_create(User(username=f'{prefix}_{i}')
+                                 for i in range(count))
+        return list(User.objects.filter(username__startswith=f'{prefix}_')
+                    .order_by('pk'))
+
+    def fill(self, options):
+        authors = self.users('bench_author', options['authors'])
+        readers = self.users('bench_reader', options['readers'])
+        Profile.objects.bulk_create(
+            Profile(user=user) for user in authors + readers)
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {i}', author=author)
+             for i in range(options['posts']) for author in authors),
+            batch_size=500)
+        weights = zipf_cum_weights(len(authors))
+        follows = []
+        for reader in readers:
+            chosen = set(self.random.choices(authors, cum_weights=weights,
+                                             k=options['follows']))
+            follows.extend(Follow(user=reader, author=author)
+                           for author in chosen)
+        Follow.objects.bulk_create(follows, batch_size=500)
+        return authors, readers
+
+    def naive(self, readers, repeat):
+        queue = cycle(readers)
+        read = measure(lambda: list(
+            Post.objects.filter(author__following__user=next(queue))
+            .select_related('author', 'group')[:TEN_ENTRIES + 1]), repeat)
+        self.stdout.write(f'{"IN-query":<10} {0:>8} {read["p50"]:>9.2f} '
+                          f'{read["max"]:>9.2f} {0:>10.2f} {0:>10.2f}')
+
+    def run(self, schema, authors, readers, repeat):
+        rebuild_timelines()
+        entries = TimelineEntry.objects.count()
+        queue = cycle(readers)
+        read = measure(lambda: list(TimelinePaginator(
+            next(queue), TEN_ENTRIES).get_page()), repeat)
+        top = self.write(authors[0], repeat)
+        median = self.write(authors[len(authors) // 2], repeat)
+        self.stdout.write(
+            f'{schema:<10} {entries:>8} {read["p50"]:>9.2f} '
+            f'{read["max"]:>9.2f} {top["p50"]:>10.2f} '
+            f'{median["p50"]:>10.2f}')
+
+    def write(self, author, repeat):
+        """Раздача нового поста автора подписчикам."""
+        posts = []
+
+        def publish():
+            posts.append(Post.objects.create(text='Новый пост',
+                                             author=author))
+
+        # сигнал раздачи срабатывает только после коммита, а замер
+        # идет в откатываемой транзакции: раздача вызывается явно
+        return measure(lambda: fan_out(posts[-1].pk), repeat,
+                       setup=publish)
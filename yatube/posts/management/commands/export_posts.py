@@ -0,0 +1,114 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exchange import (FORMATS, GROUP_FIELDS, POST_COLUMNS,
+                            POST_FIELDS, STDIO, open_output, parse_moment)
+from posts.models import Group, Post
+
+PROGRESS_EVERY = 100_000
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты (или группы) в NDJSON или CSV. Строки '
+            'читаются частями по id, поэтому память не растет '
+            'с размером выгрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--output', default=STDIO,
+                            help='файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--gzip', action='store_true',
+                            help='сжимать выгрузку gzip на лету')
+        parser.add_argument('--groups', action='store_true',
+                            help='выгрузить группы вместо постов')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--since', help='посты не раньше даты')
+        parser.add_argument('--until', help='посты раньше даты')
+        parser.add_argument('--chunk-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if options['groups']:
+            queryset = Group.objects.all()
+            columns = fields = GROUP_FIELDS
+        else:
+            queryset = self.posts(options)
+            columns, fields = POST_COLUMNS, POST_FIELDS
+        started = time.perf_counter()
+        # строки выгрузки сами заканчиваются переводом строки, лишний
+        # OutputWrapper к ним дописывать не должен
+        self.stdout.ending = ''
+        output = open_output(options['output'], options['gzip'],
+                             self.stdout)
+        with output as stream:
+            write = self.writer(options['format'], stream, fields)
+            total = 0
+            for row in self.chunked(queryset, columns,
+                                    options['chunk_size']):
+                write(row)
+                total += 1
+                if total % PROGRESS_EVERY == 0:
+                    self.report(total, started)
+        # данные могут идти в stdout, поэтому отчет пишется в stderr
+        self.report(total, started, self.style.SUCCESS)
+
+    def posts(self, options):
+        queryset = Post.objects.all()
+        if options['group']:
+            queryset = queryset.filter(group__slug=options['group'])
+        if options['author']:
+            queryset = queryset.filter(author__username=options['author'])
+        try:
+            if options['since']:
+                queryset = queryset.filter(
+                    pub_date__gte=parse_moment(options['since']))
+            if options['until']:
+                queryset = queryset.filter(
+                    pub_date__lt=parse_moment(options['until']))
+        except ValueError as error:
+            raise CommandError(error)
+        return queryset
+
+    def chunked(self, queryset, columns, chunk_size):
+        """Значения columns частями по возрастанию id.
+
+        Каждая часть — отдельный короткий запрос с условием
+        id > последнего, так что ни база, ни процесс не держат
+        всю выгрузку целиком.
+        """
+        queryset = queryset.values_list('pk', *columns).order_by('pk')
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+
+    def writer(self, output_format, stream, fields):
+        if output_format == 'csv':
+            writer = csv.writer(stream)
+            writer.writerow(fields)
+            return lambda row: writer.writerow(plain(row))
+
+        def write(row):
+            record = dict(zip(fields, plain(row)))
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return write
+
+    def report(self, total, started, style=str):
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stderr.write(f'Выгружено строк: {total} за {elapsed:.1f} с '
+                          f'({rate:.0f} строк/с)', style_func=style)
+
+
+def plain(row):
+    """Даты — в ISO 8601 с микросекундами, чтобы выгрузка
+    загружалась обратно без потери порядка постов."""
+    return [value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row]
@@ -0,0 +1,147 @@
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts.bulk import (BULK_CACHE_KIB, datetime_converter, insert_post_rows,
+                        page_cache)
+from posts.cache import GLOBAL_SCOPE, bump_page_versions, drop_cached_counts
+from posts.counters import BATCH_SIZE, rebuild_post_counters
+from posts.exchange import FORMATS, STDIO, open_input, read_rows
+from posts.models import Group, PostImport, User
+from posts.search import bulk_indexing
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты (или группы) из NDJSON или CSV. Пачки '
+            'вставляются и индексируются для поиска в отдельных '
+            'транзакциях, а счетчики и кеш обновляются один раз в конце. '
+            'Прерванная загрузка продолжается повторным запуском с тем '
+            'же --name.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default=STDIO,
+                            help='файл выгрузки, по умолчанию stdin')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--groups', action='store_true',
+                            help='загрузить группы вместо постов')
+        parser.add_argument('--name',
+                            help='имя загрузки для продолжения, '
+                                 'по умолчанию путь к файлу')
+        parser.add_argument('--batch-size', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        with open_input(options['input']) as stream:
+            rows = read_rows(stream, options['format'])
+            if options['groups']:
+                return self.import_groups(rows)
+            name = options['name'] or options['input']
+            self.import_posts(rows, name, options['batch_size'])
+
+    def import_groups(self, rows):
+        groups = [Group(slug=row['slug'], title=row['title'],
+                        description=row.get('description') or '')
+                  for row in rows]
+        Group.objects.bulk_create(groups, batch_size=BATCH_SIZE,
+                                  ignore_conflicts=True)
+        bump_page_versions(GLOBAL_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано групп: {len(groups)}'))
+
+    def import_posts(self, rows, name, batch_size):
+        state, _ = PostImport.objects.get_or_create(name=name)
+        if state.rows_done:
+            self.stdout.write(f'Продолжение загрузки {name} '
+                              f'со строки {state.rows_done + 1}')
+        rows = islice(rows, state.rows_done, None)
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        started = time.perf_counter()
+        with page_cache(BULK_CACHE_KIB):
+            total = self.load(rows, state, batch_size, started)
+        self.finish(state)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {total} постов за '
+            f'{time.perf_counter() - started:.1f} с'))
+
+    def load(self, rows, state, batch_size, started):
+        total = 0
+        while not state.loaded:
+            batch = list(islice(rows, batch_size))
+            with bulk_indexing():
+                self.insert(batch, state.rows_done)
+                state.rows_done += len(batch)
+                state.loaded = len(batch) < batch_size
+                state.save(update_fields=['rows_done', 'loaded'])
+            total += len(batch)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Загружено постов: {total} '
+                              f'({total / elapsed:.0f} постов/с)')
+        return total
+
+    def finish(self, state):
+        """Пересчет счетчиков в одной транзакции с удалением отметки
+        о загрузке: после сбоя здесь повторный запуск выполнит его
+        заново, а не дважды."""
+        self.stdout.write('Пересчет счетчиков')
+        with transaction.atomic():
+            rebuild_post_counters()
+            state.delete()
+        drop_cached_counts('index')
+        bump_page_versions(GLOBAL_SCOPE)
+
+    def insert(self, batch, offset):
+        self.create_missing(batch)
+        db_datetime = datetime_converter()
+        now = db_datetime(timezone.now())
+        params = []
+        for number, row in enumerate(batch, offset + 1):
+            try:
+                pub_date = row.get('pub_date')
+                params.append((
+                    row['text'],
+                    db_datetime(pub_date) if pub_date else now,
+                    self.authors[row['author']],
+                    self.groups.get(row.get('group')),
+                ))
+            except (KeyError, TypeError, ValueError) as error:
+                raise CommandError(f'Строка {number}: {error!r}')
+        insert_post_rows(params)
+
+    def create_missing(self, batch):
+        """Создает авторов и группы, которых еще нет в базе, и
+        дополняет ими словари username -> id и slug -> id."""
+        authors = {row.get('author') for row in batch} - set(self.authors)
+        groups = {row.get('group') for row in batch} - set(self.groups)
+        authors.discard(None)
+        groups -= {None, ''}
+        if authors:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=name, password=password) for name in authors),
+                batch_size=BATCH_SIZE,
+            )
+            created = dict(self.lookup(User, 'username', authors))
+            # bulk_create не вызывает сигнал, создающий профиль
+            Profile.objects.bulk_create(
+                (Profile(user_id=pk) for pk in created.values()),
+                batch_size=BATCH_SIZE,
+            )
+            self.authors.update(created)
+        if groups:
+            Group.objects.bulk_create(
+                (Group(slug=slug, title=slug) for slug in groups),
+                batch_size=BATCH_SIZE,
+            )
+            self.groups.update(self.lookup(Group, 'slug', groups))
+
+    def lookup(self, model, field, values):
+        values = list(values)
+        for start in range(0, len(values), BATCH_SIZE):
+            yield from model.objects.filter(**{
+                f'{field}__in': values[start:start + BATCH_SIZE]
+            }).values_list(field, 'pk')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_post_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики постов пользователей и групп '
+            'и выводит найденные расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения.')
+
+    def handle(self, *args, **options):
+        drift = rebuild_post_counters(fix=not options['dry_run'])
+        for obj, stored, actual in drift:
+            self.stdout.write(f'{obj._meta.model_name} {obj.pk}: '
+                              f'{stored} -> {actual}')
+        verb = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений {verb}: {len(drift)}'))
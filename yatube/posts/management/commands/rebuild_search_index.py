@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.search_sql import FTS_TABLE
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс постов по частям, '
+            'каждая часть — в отдельной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        last_id, total = 0, 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT max(id), count(*) FROM ('
+                    'SELECT id FROM posts_post WHERE id > %s '
+                    'ORDER BY id LIMIT %s)',
+                    (last_id, chunk_size),
+                )
+                chunk_last_id, count = cursor.fetchone()
+                if not count:
+                    break
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                    f'SELECT id, text FROM posts_post '
+                    f'WHERE id > %s AND id <= %s',
+                    (last_id, chunk_last_id),
+                )
+            last_id = chunk_last_id
+            total += count
+            self.stdout.write(f'Проиндексировано постов: {total}')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {total} постов за '
+            f'{time.perf_counter() - started:.1f} с'))
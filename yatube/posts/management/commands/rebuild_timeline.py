@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики подписчиков и заново собирает ленты '
+            'подписок, например после import_posts.')
+
+    def handle(self, *args, **options):
+        written = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {written}'))
@@ -0,0 +1,81 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from posts.cache import GLOBAL_SCOPE, bump_page_versions, invalidate_posts
+from posts.counters import BATCH_SIZE
+from posts.models import Post
+from posts.thumbnails import process_pool, try_make_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Заново готовит миниатюры картинок постов в пуле процессов '
+            'на всех ядрах, например после изменения '
+            'POST_THUMBNAIL_WIDTHS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1,
+                            help='число процессов, 0 — без пула')
+        parser.add_argument('--missing', action='store_true',
+                            help='только посты без готовых миниатюр')
+        parser.add_argument('--force', action='store_true',
+                            help='удалить прежние файлы миниатюр')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        posts = Post.objects.exclude(image='')
+        if options['missing']:
+            posts = posts.filter(thumbnails='')
+        rows = list(posts.values_list('pk', 'author_id', 'group_id',
+                                      'modified', 'image'))
+        names = [row[-1] for row in rows]
+        if options['force']:
+            for name in names:
+                delete(name, delete_file=False)
+        workers = options['workers']
+        if workers:
+            # крупные порции: меньше пересылок между процессами,
+            # но всем процессам хватает работы до конца
+            chunksize = max(1, len(names) // (workers * 4))
+            with process_pool(workers) as pool:
+                failed = self.store(rows, pool.map(
+                    try_make_thumbnails, names, chunksize=chunksize))
+        else:
+            failed = self.store(rows, map(try_make_thumbnails, names))
+        bump_page_versions(GLOBAL_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(rows) - failed}, с ошибкой: {failed}, '
+            f'за {time.perf_counter() - started:.1f} с'))
+
+    def store(self, rows, results):
+        """Сохраняет миниатюры пачками, возвращает число ошибок."""
+        batch, failed = [], 0
+        for (pk, author_id, group_id, modified, _), thumbnails in zip(
+                rows, results):
+            if thumbnails is None:
+                failed += 1
+                continue
+            # автор и группа входят в ключи карточек
+            batch.append(Post(pk=pk, author_id=author_id, group_id=group_id,
+                              modified=modified,
+                              thumbnails=json.dumps(thumbnails)))
+            if len(batch) == BATCH_SIZE:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+        return failed
+
+    def flush(self, batch):
+        # карточки привязаны к modified: новая отметка дает новые
+        # ключи, и реплика со старой строкой не вернет в кеш карточку
+        # без миниатюр под ключом обновленного поста
+        invalidate_posts(batch)
+        now = timezone.now()
+        for post in batch:
+            post.modified = now
+        Post.objects.bulk_update(batch, ['thumbnails', 'modified'])
@@ -0,0 +1,135 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.bulk import (BULK_CACHE_KIB, datetime_converter, insert_post_rows,
+                        page_cache)
+from posts.cache import GLOBAL_SCOPE, bump_page_versions, drop_cached_counts
+from posts.counters import BATCH_SIZE, rebuild_post_counters
+from posts.models import Group, User
+from posts.search import bulk_indexing
+from users.models import Profile
+
+# пароль всех сгенерированных пользователей, чтобы под ними
+# можно было войти при нагрузочном тестировании
+SEED_PASSWORD = 'seed-password'
+# показатель степени в законе Ципфа: немногие авторы и группы
+# собирают большую часть постов
+ZIPF_EXPONENT = 1.1
+NO_GROUP_SHARE = 0.3
+SENTENCE_POOL = 5_000
+HISTORY_DAYS = 3 * 365
+
+
+def zipf_cum_weights(count, exponent=ZIPF_EXPONENT):
+    return list(accumulate(1 / (rank ** exponent)
+                           for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами и '
+            'постами с неравномерным распределением постов по авторам '
+            'и группам. Вставка идет пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='зерно генератора для повторяемых данных')
+        parser.add_argument('--batch-size', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.random = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake_latin = Faker('en_US')
+        with transaction.atomic():
+            authors = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+        self.create_posts(options['posts'], authors, groups,
+                          options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(authors)}, групп: {len(groups)}, '
+            f'постов: {options["posts"]} за '
+            f'{time.perf_counter() - started:.1f} с'))
+
+    def create_users(self, count):
+        """Имена уникальны за счет суффикса: id новых записей всегда
+        больше наибольшего существующего. bulk_create не вызывает
+        сигналов, поэтому профили создаются здесь же."""
+        fake = self.fake
+        after_id = User.objects.aggregate(top=Max('pk'))['top'] or 0
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'{self.fake_latin.user_name()}_{after_id + i}',
+                  first_name=fake.first_name(), last_name=fake.last_name(),
+                  password=password)
+             for i in range(1, count + 1)),
+            batch_size=BATCH_SIZE,
+        )
+        users = list(User.objects.filter(pk__gt=after_id)
+                     .order_by('pk').values_list('pk', flat=True))
+        Profile.objects.bulk_create(
+            (Profile(user_id=pk) for pk in users), batch_size=BATCH_SIZE)
+        return users
+
+    def create_groups(self, count):
+        fake = self.fake
+        after_id = Group.objects.aggregate(top=Max('pk'))['top'] or 0
+        Group.objects.bulk_create(
+            (Group(slug=f'{self.fake_latin.slug()}-{after_id + i}',
+                   title=fake.sentence(nb_words=3).rstrip('.'),
+                   description=fake.paragraph())
+             for i in range(1, count + 1)),
+            batch_size=BATCH_SIZE,
+        )
+        return list(Group.objects.filter(pk__gt=after_id)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def create_posts(self, count, authors, groups, batch_size):
+        """Посты вставляются в порядке времени публикации, как
+        накапливались бы в живой базе."""
+        if not count or not authors:
+            return
+        rows = self.post_rows(count, authors, groups)
+        with bulk_indexing():
+            with page_cache(BULK_CACHE_KIB):
+                for offset in range(0, count, batch_size):
+                    insert_post_rows(islice(rows, batch_size))
+                    self.stdout.write('Создано постов: '
+                                      f'{min(offset + batch_size, count)}')
+            self.stdout.write('Индексация для поиска, пересчет счетчиков')
+            rebuild_post_counters()
+        drop_cached_counts('index')
+        bump_page_versions(GLOBAL_SCOPE)
+
+    def post_rows(self, count, authors, groups):
+        """Строки для insert_post_rows. Тексты собираются из заранее
+        сгенерированных предложений: Faker на каждый пост слишком
+        медленный для миллионов строк."""
+        rnd = self.random
+        sentences = [self.fake.sentence()
+                     for _ in range(min(SENTENCE_POOL, count))]
+        author_weights = zipf_cum_weights(len(authors))
+        group_weights = zipf_cum_weights(len(groups))
+        start = timezone.now() - timedelta(days=HISTORY_DAYS)
+        step = timedelta(days=HISTORY_DAYS) / count
+        db_datetime = datetime_converter()
+        for i in range(count):
+            sentence_count = int(rnd.lognormvariate(1, 0.7)) + 1
+            author = rnd.choices(authors, cum_weights=author_weights)[0]
+            group = None
+            if groups and rnd.random() >= NO_GROUP_SHARE:
+                group = rnd.choices(groups, cum_weights=group_weights)[0]
+            yield (' '.join(rnd.choices(sentences, k=sentence_count)),
+                   db_datetime(start + step * i), author, group)
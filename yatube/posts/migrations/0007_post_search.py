@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from posts.search_sql import (CREATE_TABLE_SQL, FTS_TABLE, REBUILD_SQL,
+                              TRIGGERS, TRIGGERS_SQL)
+
+CREATE_SQL = (
+    CREATE_TABLE_SQL,
+    *TRIGGERS_SQL,
+    REBUILD_SQL,
+)
+
+DROP_SQL = (
+    *(f'DROP TRIGGER IF EXISTS {name}' for name in reversed(TRIGGERS)),
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
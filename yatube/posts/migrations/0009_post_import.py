@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_group_title_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='source')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='rows done')),
+                ('after_id', models.PositiveIntegerField(default=0, verbose_name='after id')),
+                ('deferred_indexes', models.TextField(blank=True, verbose_name='deferred indexes')),
+                ('loaded', models.BooleanField(default=False, verbose_name='loaded')),
+                ('started', models.DateTimeField(auto_now_add=True, verbose_name='started')),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+from posts.search_sql import restore_triggers
+
+# SQLite добавляет и удаляет поле, пересоздавая таблицу, и вместе
+# со старой таблицей пропадают триггеры поискового индекса
+# из 0007_post_search: restore_triggers создает их заново
+
+
+def copy_pub_date(apps, schema_editor):
+    """Существующие посты считаются измененными в момент публикации."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(modified=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_import'),
+    ]
+
+    operations = [
+        # при откате выполняется последней, после удаления поля
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='modified'),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
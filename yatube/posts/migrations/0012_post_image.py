@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+from posts.search_sql import restore_triggers
+
+# SQLite пересоздает таблицу постов при добавлении и удалении полей:
+# триггеры поискового индекса создаются заново, как в 0010_post_modified
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_follow_timeline'),
+    ]
+
+    operations = [
+        # при откате выполняется последней, после удаления полей
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='posts/', verbose_name='image'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.TextField(blank=True, editable=False, verbose_name='thumbnails'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:46
+
+import time
+
+from django.db import migrations, models
+
+
+def start_versions(apps, schema_editor):
+    # ETag, выданные до миграции по версиям из кеша, не совпадут
+    # с новыми: глобальная версия начинается с момента миграции
+    FeedVersion = apps.get_model('posts', 'FeedVersion')
+    FeedVersion.objects.create(scope='all', version=time.time_ns())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedVersion',
+            fields=[
+                ('scope', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='scope')),
+                ('version', models.BigIntegerField(verbose_name='version')),
+            ],
+        ),
+        migrations.RunPython(start_versions, migrations.RunPython.noop),
+    ]
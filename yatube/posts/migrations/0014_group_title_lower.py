@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+import posts.models
+
+
+def fill_title_lower(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    for pk, title in list(Group.objects.values_list('pk', 'title')):
+        Group.objects.filter(pk=pk).update(title_lower=title.lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='title_lower',
+            field=posts.models.LowercaseCopy('title', default='', editable=False, max_length=200, verbose_name='name in lower case'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_title_lower, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title_lower'], name='group_title_lower_idx'),
+        ),
+    ]
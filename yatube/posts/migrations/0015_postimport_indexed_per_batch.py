@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:40
+
+from django.db import migrations
+
+from posts.search_sql import (FTS_TABLE, INSERT_TRIGGER, INSERT_TRIGGER_SQL,
+                              REBUILD_SQL)
+
+
+def finish_paused_indexing(apps, schema_editor):
+    """Загрузка, начатая прежней версией import_posts, держит снятым
+    триггер индексации новых постов, а с --defer-indexes — и удаленными
+    индексы постов. Теперь каждая пачка индексируется в своей
+    транзакции: индексы и триггер возвращаются, пропущенные посты
+    индексируются."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    PostImport = apps.get_model('posts', 'PostImport')
+    imports = list(PostImport.objects.values_list('after_id',
+                                                  'deferred_indexes'))
+    if not imports:
+        return
+    for _, deferred_indexes in imports:
+        for sql in filter(None, deferred_indexes.split(';\n')):
+            schema_editor.execute(
+                sql.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+            "AND name = %s", (INSERT_TRIGGER,))
+        if cursor.fetchone() is not None:
+            # триггер вернула миграция, выполненная посреди загрузки:
+            # какие посты им проиндексированы, не узнать
+            schema_editor.execute(REBUILD_SQL)
+            return
+    after_id = min(after_id for after_id, _ in imports)
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE}(rowid, text) '
+        f'SELECT id, text FROM posts_post WHERE id > %s', (after_id,))
+    schema_editor.execute(INSERT_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_group_title_lower'),
+    ]
+
+    operations = [
+        migrations.RunPython(finish_paused_indexing,
+                             migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='postimport',
+            name='after_id',
+        ),
+        migrations.RemoveField(
+            model_name='postimport',
+            name='deferred_indexes',
+        ),
+    ]
@@ -1,28 +1,74 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
 POST_LEN = 15
 
 
+class LowercaseCopy(models.CharField):
+    """Копия поля source в нижнем регистре для поиска без учета
+    регистра по обычному индексу: lower() и LIKE в SQLite не знают
+    регистра кириллицы.
+
+    Значение вычисляется в pre_save, поэтому заполняется и в save(),
+    и в bulk_create.
+    """
+
+    def __init__(self, source, *args, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.source).lower()
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Group(models.Model):
     """Модель для хранения групп"""
     title = models.CharField(max_length=200,
                              verbose_name='name')
+    title_lower = LowercaseCopy('title', max_length=200,
+                                verbose_name='name in lower case')
     slug = models.SlugField(unique=True,
                             verbose_name='addres')
     description = models.TextField(verbose_name='description')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name='posts count')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title'], name='group_title_idx'),
+            models.Index(fields=['title_lower'],
+                         name='group_title_lower_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is not None and 'title' in update_fields:
+            update_fields = {*update_fields, 'title_lower'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Post(models.Model):
     """Модель для хранения постов"""
     text = models.TextField(verbose_name='text')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='date')
+    # pub_date не меняется при правке; modified — валидатор
+    # Last-Modified для страницы поста
+    modified = models.DateTimeField(auto_now=True,
+                                    verbose_name='modified')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,9 +83,128 @@ class Post(models.Model):
         verbose_name='group',
         related_name='posts'
     )
+    image = models.ImageField(upload_to='posts/', blank=True,
+                              verbose_name='image')
+    # JSON-список [url, ширина, высота] миниатюр картинки, готовых
+    # заранее (posts.thumbnails): шаблоны строят srcset без обращений
+    # к файлам
+    thumbnails = models.TextField(blank=True, editable=False,
+                                  verbose_name='thumbnails')
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:POST_LEN]
+
+    def save(self, *args, **kwargs):
+        # счетчики постов обновляются в post_save и должны попасть
+        # в ту же транзакцию, что и сам пост
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class Follow(models.Model):
+    """Модель для хранения подписок на авторов"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='follower',
+        related_name='follower'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='author',
+        related_name='following'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='no_self_follow'),
+        ]
+        # подписчики автора для раздачи его новых постов
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя.
+
+    Дата публикации скопирована из поста, чтобы страница ленты
+    читалась по индексу (user, -pub_date, -post) без сортировки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='reader',
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='post',
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField(verbose_name='date')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.post_id}'
+
+
+class PostImport(models.Model):
+    """Незавершенная загрузка постов командой import_posts.
+
+    Число загруженных строк обновляется в той же транзакции, что и
+    вставка пачки, поэтому прерванная загрузка продолжается ровно
+    с первой незаписанной строки.
+    """
+    name = models.CharField(max_length=255, unique=True,
+                            verbose_name='source')
+    rows_done = models.PositiveIntegerField(default=0,
+                                            verbose_name='rows done')
+    loaded = models.BooleanField(default=False, verbose_name='loaded')
+    started = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='started')
+
+    def __str__(self):
+        return self.name
+
+
+class FeedVersion(models.Model):
+    """Версия ленты: отметка времени последней записи, затронувшей
+    область scope (posts.cache). Хранится в базе, а не в кеше
+    процесса, поэтому ETag и Last-Modified ленты одинаковы во всех
+    процессах."""
+    scope = models.CharField(max_length=255, primary_key=True,
+                             verbose_name='scope')
+    version = models.BigIntegerField(verbose_name='version')
+
+    def __str__(self):
+        return f'{self.scope}: {self.version}'
@@ -0,0 +1,198 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import COUNT_TIMEOUT, count_key
+
+FORWARD = 'n'
+BACKWARD = 'p'
+EXACT_COUNT_LIMIT = 10_000
+PAGE_WINDOW = 3
+
+
+def make_cursor(pub_date, pk, direction=FORWARD):
+    """Кодирует позицию в ленте в непрозрачный токен."""
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_cursor(post, direction=FORWARD):
+    return make_cursor(post.pub_date, post.pk, direction)
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для битого токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def after_cursor(queryset, pub_date, pk, pk_field='pk'):
+    """Посты ленты старше позиции (pub_date, pk), от новых к старым.
+
+    Условие на pub_date вынесено отдельно, чтобы SQLite начинал
+    чтение индекса сразу с нужного места. pk_field — поле с id поста,
+    если лента состоит не из самих постов.
+    """
+    return queryset.filter(pub_date__lte=pub_date).filter(
+        Q(pub_date__lt=pub_date) | Q(**{f'{pk_field}__lt': pk})
+    ).order_by('-pub_date', f'-{pk_field}')
+
+
+def before_cursor(queryset, pub_date, pk, pk_field='pk'):
+    """Посты ленты новее позиции (pub_date, pk), от старых к новым."""
+    return queryset.filter(pub_date__gte=pub_date).filter(
+        Q(pub_date__gt=pub_date) | Q(**{f'{pk_field}__gt': pk})
+    ).order_by('pub_date', pk_field)
+
+
+class CursorPage(Sequence):
+    """Страница ленты, полученная по ключу (pub_date, id)."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.object_list[0], BACKWARD)
+
+
+class CursorPaginator:
+    """Пагинатор без OFFSET и COUNT(*).
+
+    Каждая страница выбирается условием по (pub_date, id) относительно
+    последнего поста предыдущей страницы, поэтому стоимость запроса
+    не зависит от глубины страницы.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, token=None):
+        cursor = decode_cursor(token) if token else None
+        if cursor is None:
+            return self._forward(self.queryset, has_previous=False)
+        direction, pub_date, pk = cursor
+        if direction == FORWARD:
+            return self._forward(after_cursor(self.queryset, pub_date, pk),
+                                 has_previous=True)
+        page = self._backward(before_cursor(self.queryset, pub_date, pk))
+        if not page:
+            return self._forward(self.queryset, has_previous=False)
+        return page
+
+    def _forward(self, queryset, has_previous):
+        rows = list(
+            queryset.order_by('-pub_date', '-pk')[:self.per_page + 1]
+        )
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next, has_previous)
+
+    def _backward(self, queryset):
+        rows = list(
+            queryset.order_by('pub_date', 'pk')[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(rows, self, True, has_previous)
+
+
+class WindowedPage(Page):
+    """Страница, которая отдает только ближайшие номера страниц."""
+
+    @property
+    def page_window(self):
+        first = max(1, self.number - PAGE_WINDOW)
+        last = min(self.paginator.num_pages, self.number + PAGE_WINDOW)
+        return range(first, last + 1)
+
+
+class WindowedPaginator(Paginator):
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class CachedCountPaginator(WindowedPaginator):
+    """Paginator, который не считает COUNT(*) на каждый запрос.
+
+    Число объектов берется из кеша по count_scope. При промахе
+    выполняется подсчет, ограниченный EXACT_COUNT_LIMIT строками;
+    если строк больше, число оценивается и estimated становится True.
+    """
+
+    def __init__(self, object_list, per_page, *args, count_scope=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.count_scope = count_scope
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        if self.count_scope is None:
+            count, self.estimated = self._bounded_count()
+            return count
+        key = count_key(self.count_scope)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self._bounded_count()
+            cache.set(key, cached, COUNT_TIMEOUT)
+        count, self.estimated = cached
+        return count
+
+    def _bounded_count(self):
+        count = self.object_list[:EXACT_COUNT_LIMIT + 1].count()
+        if count <= EXACT_COUNT_LIMIT:
+            return count, False
+        return max(self._estimate(), count), True
+
+    def _estimate(self):
+        """Для всей таблицы — наибольший id (поиск по первичному ключу),
+        для отфильтрованной выборки — только нижняя граница."""
+        if self.object_list.query.where:
+            return EXACT_COUNT_LIMIT + 1
+        model = self.object_list.model
+        return model._default_manager.aggregate(top=Max('pk'))['top'] or 0
@@ -0,0 +1,136 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .search_sql import FTS_TABLE, INSERT_TRIGGER, INSERT_TRIGGER_SQL
+
+SNIPPET_TOKENS = 16
+# Маркеры подсветки, которых не бывает в тексте постов: snippet()
+# вставляет их до экранирования, а после экранирования они
+# заменяются на теги.
+MARK_START = '\x02'
+MARK_END = '\x03'
+WORD_RE = re.compile(r'\w+')
+# наибольший символ Unicode: 'abc' <= x < 'abc' + PREFIX_END — это
+# все строки с префиксом 'abc', и такое условие читается по индексу
+PREFIX_END = '\U0010ffff'
+
+
+@contextmanager
+def bulk_indexing():
+    """Транзакция массовой вставки постов: вставленные в ней посты
+    индексируются для поиска одним INSERT ... SELECT по диапазону id,
+    а не триггером построчно.
+
+    Триггер снимается и возвращается в той же транзакции, поэтому
+    другие соединения не видят схему без него, а при сбое откат
+    возвращает его вместе с отменой вставки.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # DROP берет блокировку записи до чтения max(id): до конца
+        # транзакции новых постов, кроме вставленных в блоке, нет
+        cursor.execute(f'DROP TRIGGER IF EXISTS {INSERT_TRIGGER}')
+        cursor.execute('SELECT max(id) FROM posts_post')
+        after_id = cursor.fetchone()[0] or 0
+        yield
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) '
+            f'SELECT id, text FROM posts_post WHERE id > %s',
+            (after_id,),
+        )
+        cursor.execute(INSERT_TRIGGER_SQL)
+
+
+def to_match(query):
+    """Превращает пользовательский ввод в безопасный запрос FTS5:
+    каждое слово в кавычках, последнее ищется по префиксу."""
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def prefix_q(field, prefix):
+    """Условие «начинается с prefix» без учета регистра по полю,
+    которое хранит значение в нижнем регистре (LowercaseCopy).
+
+    LIKE в SQLite не использует обычный индекс, поэтому префикс
+    превращается в диапазон по индексированному полю.
+    """
+    prefix = prefix.lower()
+    return Q(**{f'{field}__gte': prefix,
+                f'{field}__lt': prefix + PREFIX_END})
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def matching_ids(match):
+    """Подзапрос id постов, найденных полнотекстовым индексом."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    )
+
+
+class SearchResults:
+    """Результаты поиска по тексту постов, упорядоченные по bm25.
+
+    Поддерживает count() и срезы, поэтому передается в Paginator
+    как обычная выборка: из индекса читается только нужная страница.
+    """
+
+    def __init__(self, query):
+        self.match = to_match(query)
+
+    def count(self):
+        if self.match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                (self.match,),
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if self.match is None or index.stop is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                (MARK_START, MARK_END, '…', SNIPPET_TOKENS, self.match,
+                 index.stop - start, start),
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
@@ -0,0 +1,53 @@
+"""SQL полнотекстового индекса постов в SQLite.
+
+Модуль не импортирует модели: его используют и миграции, и код
+приложения, и триггеры везде создаются из одних и тех же строк.
+"""
+FTS_TABLE = 'posts_post_fts'
+INSERT_TRIGGER = f'{FTS_TABLE}_insert'
+DELETE_TRIGGER = f'{FTS_TABLE}_delete'
+UPDATE_TRIGGER = f'{FTS_TABLE}_update'
+
+CREATE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+INSERT_TRIGGER_SQL = f"""
+    CREATE TRIGGER IF NOT EXISTS {INSERT_TRIGGER}
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+"""
+DELETE_TRIGGER_SQL = f"""
+    CREATE TRIGGER IF NOT EXISTS {DELETE_TRIGGER}
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+"""
+UPDATE_TRIGGER_SQL = f"""
+    CREATE TRIGGER IF NOT EXISTS {UPDATE_TRIGGER}
+    AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+"""
+TRIGGERS = (INSERT_TRIGGER, DELETE_TRIGGER, UPDATE_TRIGGER)
+TRIGGERS_SQL = (INSERT_TRIGGER_SQL, DELETE_TRIGGER_SQL, UPDATE_TRIGGER_SQL)
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def restore_triggers(apps, schema_editor):
+    """Создает недостающие триггеры индекса. SQLite добавляет
+    и удаляет поле, пересоздавая таблицу постов, и вместе со старой
+    таблицей пропадают ее триггеры."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
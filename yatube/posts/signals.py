@@ -0,0 +1,165 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .cache import bump_page_versions, drop_cached_counts, invalidate_posts
+from . import thumbnails, timeline
+from .counters import adjust_followers_count, adjust_post_counters
+from .models import Follow, Group, Post, User
+
+USER_CARD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def feed_scopes(post):
+    """Области страничного кеша, в лентах которых виден пост."""
+    scopes = {'index', f'post:{post.pk}', f'profile:{post.author.username}'}
+    if post.group_id is not None:
+        scopes.add(f'group:{post.group.slug}')
+    return scopes
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    """Пост могли перенести в другую группу или к другому автору:
+    старые ленты и счетчики тоже нужно поправить. Миниатюры
+    замененной картинки больше не годятся."""
+    instance._old_values = None
+    if instance.pk is not None and not raw:
+        instance._old_values = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('author_id', 'group_id', 'group__slug', 'image')
+            .first()
+        )
+    old_image = instance._old_values[3] if instance._old_values else ''
+    if instance.image.name != old_image:
+        instance.thumbnails = ''
+
+
+@receiver(post_save, sender=Post)
+def update_post_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance._old_values is None:
+        adjust_post_counters(instance.author_id, instance.group_id, 1)
+        drop_cached_counts('index')
+        return
+    old_author_id, old_group_id, _, _ = instance._old_values
+    if old_author_id != instance.author_id:
+        adjust_post_counters(old_author_id, None, -1)
+        adjust_post_counters(instance.author_id, None, 1)
+    if old_group_id != instance.group_id:
+        adjust_post_counters(None, old_group_id, -1)
+        adjust_post_counters(None, instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_post_counters(sender, instance, **kwargs):
+    adjust_post_counters(instance.author_id, instance.group_id, -1)
+    drop_cached_counts('index')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def drop_post_card(sender, instance, **kwargs):
+    """Пост изменился или удален: его карточки и ленты устарели."""
+    invalidate_posts([instance])
+    scopes = feed_scopes(instance)
+    old_values = getattr(instance, '_old_values', None)
+    if old_values is not None and old_values[2] is not None:
+        scopes.add(f'group:{old_values[2]}')
+    bump_page_versions(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.schedule(timeline.fan_out, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def make_post_thumbnails(sender, instance, created, raw=False, **kwargs):
+    old_image = instance._old_values[3] if instance._old_values else ''
+    if not raw and instance.image and instance.image.name != old_image:
+        thumbnails.schedule(instance.pk, instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, raw=False, **kwargs):
+    """Кнопка подписки на странице автора зависит от подписок."""
+    if not created or raw:
+        return
+    adjust_followers_count(instance.author_id, 1)
+    bump_page_versions(f'profile:{instance.author.username}')
+    timeline.schedule(timeline.backfill, instance.user_id,
+                      instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    adjust_followers_count(instance.author_id, -1)
+    bump_page_versions(f'profile:{instance.author.username}')
+    timeline.schedule(timeline.unfollow, instance.user_id,
+                      instance.author_id)
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_slug(sender, instance, raw=False, **kwargs):
+    """Лента группы под старым slug тоже устаревает."""
+    instance._old_slug = None
+    if instance.pk is not None and not raw:
+        instance._old_slug = (Group.objects.filter(pk=instance.pk)
+                              .values_list('slug', flat=True).first())
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def drop_group_cards(sender, instance, signal, created=False, **kwargs):
+    """Название или slug группы выводятся в карточках ее постов:
+    устаревают главная и лента группы, а при смене slug или удалении
+    группы — и профили ее авторов со ссылками на ленту."""
+    if created:
+        return
+    deleted = signal is pre_delete
+    old_slug = None if deleted else getattr(instance, '_old_slug', None)
+    scopes = {f'cards:group:{instance.pk}', 'index', f'group:{instance.slug}'}
+    if old_slug is not None:
+        scopes.add(f'group:{old_slug}')
+    if deleted or old_slug != instance.slug:
+        authors = (instance.posts.order_by()
+                   .values_list('author__username', flat=True).distinct())
+        scopes.update(f'profile:{username}' for username in authors)
+    bump_page_versions(*scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    """Профиль под старым username тоже устаревает. Вход пользователя
+    (обновление last_login) лишнего запроса не делает."""
+    instance._old_username = None
+    if instance.pk is None or raw:
+        return
+    if update_fields is not None and not USER_CARD_FIELDS & update_fields:
+        return
+    instance._old_username = (User.objects.filter(pk=instance.pk)
+                              .values_list('username', flat=True).first())
+
+
+@receiver(post_save, sender=User)
+def drop_author_cards(sender, instance, created, update_fields, **kwargs):
+    """Имя автора выводится в карточках: устаревают главная, его
+    профиль и ленты групп, в которых он писал. Вход пользователя
+    (обновление last_login) карточки не трогает."""
+    if created:
+        return
+    if update_fields is not None and not USER_CARD_FIELDS & update_fields:
+        return
+    scopes = {f'cards:author:{instance.pk}', 'index',
+              f'profile:{instance.username}'}
+    old_username = getattr(instance, '_old_username', None)
+    if old_username is not None:
+        scopes.add(f'profile:{old_username}')
+    groups = (instance.posts.exclude(group=None).order_by()
+              .values_list('group__slug', flat=True).distinct())
+    scopes.update(f'group:{slug}' for slug in groups)
+    bump_page_versions(*scopes)
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cache import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, variant):
+    """Список HTML карточек постов ленты из кеша фрагментов."""
+    return render_cards(posts, variant)
@@ -0,0 +1,26 @@
+from django import template
+
+from posts.thumbnails import load_thumbnails
+
+register = template.Library()
+
+# миниатюра для src, если браузер не поддерживает srcset
+FALLBACK_WIDTH = 640
+CARD_SIZES = '(max-width: 768px) 100vw, 640px'
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, sizes=CARD_SIZES):
+    """Картинка поста с srcset из готовых миниатюр, без обращений
+    к файлам."""
+    thumbnails = load_thumbnails(post)
+    if not thumbnails:
+        return {}
+    fallback = next((thumbnail for thumbnail in thumbnails
+                     if thumbnail[1] >= FALLBACK_WIDTH), thumbnails[-1])
+    return {
+        'src': fallback,
+        'srcset': ', '.join(f'{url} {width}w'
+                            for url, width, _ in thumbnails),
+        'sizes': sizes,
+    }
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_budget import QueryBudget
+from ..models import Group, Post
+
+User = get_user_model()
+
+GROUPS = 10_000
+POSTS = 150
+CHANGELIST_QUERIES = 4
+CHANGELIST_BYTES = 300_000
+
+
+class PostAdminScaleTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='AdminDog', email='admin@yatube.ru', password='pass')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}',
+                  description='Тестовое описание')
+            for i in range(GROUPS)
+        )
+        groups = list(Group.objects.order_by('pk')[:POSTS])
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.admin, group=group)
+            for i, group in enumerate(groups)
+        )
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def test_changelist_is_bounded(self):
+        """Список постов в админке не зависит от числа групп"""
+        url = reverse('admin:posts_post_changelist')
+        with QueryBudget(CHANGELIST_QUERIES):
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(response.content), CHANGELIST_BYTES)
+
+    def test_changelist_filtered_by_date(self):
+        """Фильтр по дате укладывается в тот же бюджет"""
+        url = reverse('admin:posts_post_changelist')
+        with QueryBudget(CHANGELIST_QUERIES):
+            response = self.admin_client.get(
+                url, {'pub_date__gte': '2000-01-01 00:00:00+00:00'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_autocomplete(self):
+        """Группы для поля group подгружаются поиском по префиксу"""
+        response = self.admin_client.get(
+            reverse('admin:posts_group_autocomplete'), {'term': 'group-999'})
+        self.assertEqual(response.status_code, 200)
+        ids = [result['id'] for result in response.json()['results']]
+        self.assertIn(str(Group.objects.get(slug='group-999').pk), ids)
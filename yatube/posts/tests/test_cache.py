@@ -0,0 +1,349 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, reset_queries
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..cache import card_stats
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CacheDog',
+                                            first_name='Имя')
+        cls.group = Group.objects.create(
+            title='Группа для кеша',
+            slug='cache-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст до правки',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        card_stats.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_index(self):
+        """Страница для авторизованного пользователя: мимо кеша страниц,
+        но с кешем карточек."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        return response.content.decode()
+
+    def test_second_render_hits_cache(self):
+        """Повторный показ ленты берет карточку из кеша"""
+        self.get_index()
+        self.get_index()
+        self.assertEqual(card_stats['misses'], 1)
+        self.assertEqual(card_stats['hits'], 1)
+
+    def test_post_edit_invalidates_card(self):
+        """Сохранение поста сбрасывает его карточку"""
+        self.get_index()
+        self.post.text = 'Текст после правки'
+        self.post.save()
+        self.assertIn('Текст после правки', self.get_index())
+
+    def test_group_change_invalidates_card(self):
+        """Переименование группы сбрасывает карточки ее постов"""
+        self.get_index()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIn('Новое название', self.get_index())
+
+    def test_group_change_does_not_walk_posts(self):
+        """Переименование группы меняет версию ее карточек, а не
+        перебирает посты"""
+        self.group.title = 'Новое название'
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            self.group.save()
+        self.assertFalse([query['sql'] for query in queries
+                          if 'FROM "posts_post"' in query['sql']])
+
+    def test_group_delete_invalidates_card(self):
+        """Удаление группы сбрасывает карточки ее постов"""
+        self.assertIn('Группа для кеша', self.get_index())
+        Group.objects.filter(pk=self.group.pk).delete()
+        self.assertNotIn('Группа для кеша', self.get_index())
+
+    def test_author_change_invalidates_card(self):
+        """Смена имени автора сбрасывает карточки, вход — нет"""
+        self.get_index()
+        self.user.last_name = 'Фамилия'
+        self.user.save(update_fields=['last_name'])
+        self.assertIn('Имя Фамилия', self.get_index())
+        self.user.save(update_fields=['last_login'])
+        self.get_index()
+        self.assertEqual(card_stats['hits'], 1)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='PageDog')
+        cls.other = User.objects.create_user(username='OtherDog')
+        cls.group = Group.objects.create(
+            title='Группа для страниц',
+            slug='page-slug',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, url, client=None):
+        return (client or self.guest_client).get(url)
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный анонимный запрос отдается из кеша без рендера"""
+        url = reverse('posts:index')
+        self.assertIsNotNone(self.get(url).context)
+        self.assertIsNone(self.get(url).context)
+        self.assertIsNotNone(self.get(url + '?page=2').context)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный пользователь всегда получает свежую страницу"""
+        url = reverse('posts:index')
+        self.get(url)
+        response = self.get(url, self.authorized_client)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, self.user.username)
+
+    def test_post_edit_bumps_only_affected_pages(self):
+        """Правка поста сбрасывает ленты старой и новой группы,
+        главную и профиль автора, но не чужие страницы"""
+        other_profile = reverse('posts:profile', kwargs={'username':
+                                                         self.other})
+        affected = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.other_group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in affected + (other_profile,):
+            self.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Новый текст', 'group': self.other_group.pk},
+        )
+        for url in affected:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.get(url).context)
+        self.assertIsNone(self.get(other_profile).context)
+
+    def assert_rerendered(self, affected, untouched):
+        for url in affected:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.get(url).context)
+        for url in untouched:
+            with self.subTest(url=url):
+                self.assertIsNone(self.get(url).context)
+
+    def test_group_change_bumps_only_its_pages(self):
+        """Смена slug группы сбрасывает главную, ее ленту и профили
+        ее авторов, но не чужие страницы"""
+        profile = reverse('posts:profile', kwargs={'username': self.user})
+        untouched = (
+            reverse('posts:group_list',
+                    kwargs={'slug': self.other_group.slug}),
+            reverse('posts:profile', kwargs={'username': self.other}),
+        )
+        for url in (reverse('posts:index'), profile) + untouched:
+            self.get(url)
+        self.group.slug = 'new-page-slug'
+        self.group.save()
+        self.assert_rerendered(
+            (reverse('posts:index'), profile,
+             reverse('posts:group_list', kwargs={'slug': 'new-page-slug'})),
+            untouched)
+
+    def test_author_change_bumps_only_own_pages(self):
+        """Смена имени автора сбрасывает главную, его профиль и ленты
+        его групп, но не чужие страницы"""
+        affected = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        untouched = (
+            reverse('posts:group_list',
+                    kwargs={'slug': self.other_group.slug}),
+            reverse('posts:profile', kwargs={'username': self.other}),
+        )
+        for url in affected + untouched:
+            self.get(url)
+        self.user.first_name = 'Новое имя'
+        self.user.save(update_fields=['first_name'])
+        self.assert_rerendered(affected, untouched)
+
+    def test_post_create_shows_on_cached_index(self):
+        """Новый пост сразу виден анонимному посетителю главной"""
+        url = reverse('posts:index')
+        self.get(url)
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'Только что написан'})
+        self.assertContains(self.get(url), 'Только что написан')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ConditionalDog')
+        cls.group = Group.objects.create(
+            title='Группа для проверок',
+            slug='conditional-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        # версии лент читаются из базы одним запросом
+        self.urls = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 1,
+            reverse('posts:profile', kwargs={'username': self.user}): 1,
+            # валидатор страницы поста — еще и его поле modified
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.pk}): 2,
+        }
+
+    def revalidate(self, url, **headers):
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url, **headers)
+        return response, len(queries)
+
+    def test_matching_etag_answers_not_modified(self):
+        """Совпавший ETag дает 304 без рендера и запросов ленты"""
+        for url, budget in self.urls.items():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                response, queries = self.revalidate(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertIsNone(response.context)
+                self.assertEqual(queries, budget)
+
+    def test_if_modified_since_answers_not_modified(self):
+        """Клиент с Last-Modified получает 304"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                last_modified = self.guest_client.get(url)['Last-Modified']
+                response, _ = self.revalidate(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_edit_changes_validators(self):
+        """После правки поста клиент получает новую страницу"""
+        etags = {url: self.guest_client.get(url)['ETag']
+                 for url in self.urls}
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Новый текст', 'group': self.group.pk},
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response, _ = self.revalidate(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Новый текст')
+
+    def test_author_change_changes_post_validators(self):
+        """Имя автора выводится на странице поста: после его смены
+        клиент получает новую страницу"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        api_url = reverse('api:v1:post_detail',
+                          kwargs={'post_id': self.post.pk})
+        etags = {url: self.guest_client.get(url)['ETag'],
+                 api_url: self.guest_client.get(api_url)['ETag']}
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'RenamedDog'
+        user.first_name = 'Новое имя'
+        user.save()
+        for page, etag in etags.items():
+            with self.subTest(url=page):
+                response, _ = self.revalidate(page,
+                                              HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(self.guest_client.get(url), 'Новое имя')
+
+    def test_validators_shared_between_processes(self):
+        """Валидаторы не зависят от кеша процесса: пустой кеш другого
+        воркера дает тот же ETag, а запись через другой воркер
+        меняет ETag этого"""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        cache.clear()
+        response, _ = self.revalidate(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        other_worker = LocMemCache('other-worker', {})
+        with mock.patch('posts.cache.cache', other_worker):
+            Post.objects.create(text='Пост другого воркера',
+                                author=self.user)
+        response, _ = self.revalidate(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Пост другого воркера')
+
+    def test_edit_sets_modified_not_pub_date(self):
+        """Правка двигает modified, но не pub_date"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertGreater(post.modified, self.post.modified)
+
+    def test_validators_differ_per_user(self):
+        """Вошедший пользователь и гость получают разные ETag,
+        страница пользователя помечается private"""
+        url = reverse('posts:index')
+        guest = self.guest_client.get(url)
+        user = self.authorized_client.get(url)
+        self.assertNotEqual(guest['ETag'], user['ETag'])
+        self.assertIn('no-cache', guest['Cache-Control'])
+        self.assertNotIn('private', guest['Cache-Control'])
+        self.assertIn('private', user['Cache-Control'])
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=guest['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,300 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from importlib import import_module
+from io import BytesIO, StringIO, TextIOWrapper
+
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.management.commands.bench_urls import URLCONFS, WRITE_ONLY
+from users.models import Profile
+from ..counters import rebuild_post_counters
+from ..exchange import parse_moment
+from ..management.commands.seed import SEED_PASSWORD
+from ..models import Group, Post, PostImport, User
+from ..search import SearchResults
+from ..search_sql import FTS_TABLE, INSERT_TRIGGER
+
+EXPORT_POSTS = 7
+IMPORT_POSTS = 7
+SEED_USERS = 20
+SEED_POSTS = 300
+
+
+class ExportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ExportDog')
+        cls.other = User.objects.create_user(username='OtherDog')
+        cls.group = Group.objects.create(
+            title='Группа для выгрузки',
+            slug='export-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(EXPORT_POSTS)
+        )
+        cls.old_post = Post.objects.create(text='Старый, "с кавычками"\n',
+                                           author=cls.other)
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=365))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'export')
+
+    def export(self, **options):
+        call_command('export_posts', output=self.path, chunk_size=3,
+                     stderr=StringIO(), **options)
+        opener = gzip.open if options.get('gzip') else open
+        with opener(self.path, 'rt', encoding='utf-8', newline='') as stream:
+            if options.get('format') == 'csv':
+                return list(csv.DictReader(stream))
+            return [json.loads(line) for line in stream]
+
+    def test_export_all_posts_by_chunks(self):
+        """Все посты выгружаются по возрастанию id, части не теряются"""
+        rows = self.export()
+        self.assertEqual([row['id'] for row in rows],
+                         list(Post.objects.order_by('pk')
+                              .values_list('pk', flat=True)))
+        self.assertEqual(rows[0]['author'], self.author.username)
+        self.assertEqual(rows[0]['group'], self.group.slug)
+
+    def test_filters(self):
+        """Фильтры по группе, автору и дате"""
+        cases = (
+            ({'group': self.group.slug}, EXPORT_POSTS),
+            ({'author': self.other.username}, 1),
+            ({'since': str(timezone.now().date() - timedelta(days=30))},
+             EXPORT_POSTS),
+            ({'until': str(timezone.now().date() - timedelta(days=30))}, 1),
+        )
+        for options, expected in cases:
+            with self.subTest(options=options):
+                self.assertEqual(len(self.export(**options)), expected)
+
+    def test_csv_and_gzip_round_trip_text(self):
+        """CSV в gzip сохраняет текст с кавычками и переводами строк"""
+        rows = self.export(format='csv', gzip=True,
+                           author=self.other.username)
+        self.assertEqual(rows[0]['text'], self.old_post.text)
+        self.assertEqual(rows[0]['group'], '')
+
+    def test_export_to_stdout_leaves_it_open(self):
+        """--output - пишет в stdout команды и не закрывает его"""
+        text_out = StringIO()
+        binary = BytesIO()
+        byte_out = TextIOWrapper(binary, encoding='utf-8')
+        for out in (text_out, byte_out):
+            call_command('export_posts', output='-', stdout=out,
+                         stderr=StringIO())
+        for out in (text_out, byte_out):
+            with self.subTest(out=out):
+                self.assertFalse(out.closed)
+                print('после выгрузки', file=out)
+        byte_out.flush()
+        for value in (text_out.getvalue(), binary.getvalue().decode()):
+            lines = value.splitlines()
+            self.assertEqual(len(lines), EXPORT_POSTS + 2)
+            self.assertEqual(json.loads(lines[0])['author'],
+                             self.author.username)
+            self.assertEqual(lines[-1], 'после выгрузки')
+
+    def test_export_groups(self):
+        """--groups выгружает группы"""
+        rows = self.export(groups=True)
+        self.assertEqual(rows, [{
+            'slug': self.group.slug,
+            'title': self.group.title,
+            'description': self.group.description,
+        }])
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'import.ndjson')
+        self.author = User.objects.create_user(username='ImportDog')
+        self.group = Group.objects.create(
+            title='Группа для загрузки',
+            slug='import-slug',
+            description='Тестовое описание'
+        )
+
+    def write(self, rows):
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def run_import(self, **options):
+        call_command('import_posts', self.path, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def rows(self, count, author='ImportDog', group='import-slug'):
+        return [{'text': f'Загруженный пост {i}', 'author': author,
+                 'group': group, 'pub_date': f'2020-01-01T00:00:{i:02}'}
+                for i in range(count)]
+
+    def test_import_posts_updates_counters_and_search(self):
+        """Посты загружаются пачками, счетчики и поиск обновляются"""
+        self.write(self.rows(IMPORT_POSTS))
+        self.run_import(batch_size=3)
+        self.author.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, IMPORT_POSTS)
+        self.assertEqual(self.group.posts_count, IMPORT_POSTS)
+        self.assertEqual(SearchResults('загруженный').count(), IMPORT_POSTS)
+        self.assertFalse(PostImport.objects.exists())
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(SearchResults('новый')[0], post)
+
+    def test_import_creates_missing_authors_and_groups(self):
+        """Неизвестные авторы и группы создаются"""
+        self.write(self.rows(2, author='NewDog', group='new-slug')
+                   + self.rows(1, group=None))
+        self.run_import()
+        new_author = User.objects.get(username='NewDog')
+        self.assertFalse(new_author.has_usable_password())
+        self.assertEqual(new_author.profile.posts_count, 2)
+        self.assertEqual(Group.objects.get(slug='new-slug').posts_count, 2)
+
+    def test_bad_row_keeps_committed_batches_and_resumes(self):
+        """После ошибки загрузка продолжается с первой
+        незаписанной строки"""
+        rows = self.rows(IMPORT_POSTS)
+        broken = dict(rows[4], author=None)
+        self.write(rows[:4] + [broken] + rows[5:])
+        with self.assertRaisesMessage(CommandError, 'Строка 5'):
+            self.run_import(batch_size=2)
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(PostImport.objects.get().rows_done, 4)
+        self.write(rows)
+        self.run_import(batch_size=2)
+        self.assertEqual(Post.objects.count(), IMPORT_POSTS)
+        self.assertEqual(SearchResults('загруженный').count(), IMPORT_POSTS)
+
+    def test_interrupted_import_warns_and_keeps_profiles(self):
+        """Прерванная загрузка: у созданных авторов есть профили,
+        проверки Django предупреждают о непересчитанных счетчиках"""
+        rows = self.rows(2, author='NewDog')
+        self.write(rows + [dict(rows[0], author=None)])
+        with self.assertRaises(CommandError):
+            self.run_import(batch_size=2)
+        self.assertTrue(
+            Profile.objects.filter(user__username='NewDog').exists())
+        warnings = [message.id for message in run_checks()]
+        self.assertIn('posts.W001', warnings)
+
+    def test_interrupted_import_keeps_search_working(self):
+        """Прерванная загрузка не выключает индексацию: записанные
+        пачки и новые посты сайта находятся, после продолжения
+        ничего не задваивается"""
+        rows = self.rows(IMPORT_POSTS)
+        broken = dict(rows[4], author=None)
+        self.write(rows[:4] + [broken])
+        with self.assertRaises(CommandError):
+            self.run_import(batch_size=2)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+                "AND name = %s", (INSERT_TRIGGER,))
+            self.assertIsNotNone(cursor.fetchone())
+        self.assertEqual(SearchResults('загруженный').count(), 4)
+        Post.objects.create(text='Загруженный вручную', author=self.author)
+        self.assertEqual(SearchResults('вручную').count(), 1)
+        self.write(rows)
+        self.run_import(batch_size=2)
+        self.assertEqual(SearchResults('загруженный').count(),
+                         IMPORT_POSTS + 1)
+        with connection.cursor() as cursor:
+            # сверяет индекс с таблицей постов, падает на задвоениях
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) "
+                f"VALUES ('integrity-check', 1)")
+
+    def test_export_import_round_trip(self):
+        """Выгрузка загружается обратно без изменений"""
+        self.write(self.rows(IMPORT_POSTS))
+        self.run_import()
+        exported = os.path.join(os.path.dirname(self.path), 'export.csv')
+        call_command('export_posts', format='csv', output=exported,
+                     stderr=StringIO())
+        Post.objects.all().delete()
+        call_command('import_posts', exported, format='csv',
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('text', 'pub_date', 'group')),
+            [(row['text'], parse_moment(row['pub_date']), self.group.pk)
+             for row in reversed(self.rows(IMPORT_POSTS))])
+
+    def test_import_groups(self):
+        """--groups загружает группы, существующие не меняются"""
+        self.write([
+            {'slug': 'import-slug', 'title': 'Другое', 'description': ''},
+            {'slug': 'fresh', 'title': 'Свежая', 'description': 'Описание'},
+        ])
+        self.run_import(groups=True)
+        self.assertEqual(Group.objects.get(slug='import-slug').title,
+                         self.group.title)
+        self.assertEqual(Group.objects.get(slug='fresh').title, 'Свежая')
+
+
+class SeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_creates_skewed_consistent_data(self):
+        """seed создает данные с перекосом по авторам,
+        счетчики и поиск согласованы с постами"""
+        call_command('seed', users=SEED_USERS, groups=3, posts=SEED_POSTS,
+                     batch_size=100, stdout=StringIO())
+        self.assertEqual(User.objects.count(), SEED_USERS)
+        self.assertEqual(Post.objects.count(), SEED_POSTS)
+        self.assertEqual(rebuild_post_counters(fix=False), [])
+        counts = sorted(User.objects.values_list('profile__posts_count',
+                                                 flat=True))
+        self.assertGreater(counts[-1], 2 * counts[len(counts) // 2])
+        word = Post.objects.first().text.split()[0]
+        self.assertGreater(SearchResults(word).count(), 0)
+        self.assertTrue(self.client.login(
+            username=User.objects.first().username, password=SEED_PASSWORD))
+
+    def test_seed_without_posts_creates_profiles(self):
+        """Пользователи seed получают профили и без постов"""
+        call_command('seed', users=3, groups=0, posts=0,
+                     stdout=StringIO())
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_bench_urls_covers_every_url(self):
+        """bench_urls замеряет все адреса posts, users и about"""
+        stdout = StringIO()
+        call_command('bench_urls', scales=[SEED_POSTS], repeat=1,
+                     json_path='-', stdout=stdout, stderr=StringIO())
+        run = json.loads(stdout.getvalue())['runs'][0]
+        names = {result['name'] for result in run['results']}
+        for urlconf in URLCONFS:
+            module = import_module(urlconf)
+            for pattern in module.urlpatterns:
+                name = f'{module.app_name}:{pattern.name}'
+                if name in WRITE_ONLY:
+                    continue
+                with self.subTest(name=pattern.name):
+                    self.assertIn(name, names)
+        for result in run['results']:
+            with self.subTest(name=result['name']):
+                self.assertEqual(result['status'], HTTPStatus.OK)
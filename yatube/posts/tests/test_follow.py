@@ -0,0 +1,188 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models.signals import post_save
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import resolve, reverse
+
+from core.query_budget import QueryBudget
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='FollowedDog')
+        cls.reader = User.objects.create_user(username='ReaderDog')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def url(self, name, user=None):
+        return reverse(f'posts:{name}',
+                       kwargs={'username': (user or self.author).username})
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют подписки и счетчик подписчиков"""
+        response = self.client.post(self.url('profile_follow'))
+        self.assertRedirects(response, self.url('profile'))
+        self.client.post(self.url('profile_follow'))
+        self.assertEqual(Follow.objects.filter(
+            user=self.reader, author=self.author).count(), 1)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertTrue(
+            self.client.get(self.url('profile')).context['following'])
+        self.client.post(self.url('profile_unfollow'))
+        self.assertFalse(Follow.objects.exists())
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 0)
+        self.assertFalse(
+            self.client.get(self.url('profile')).context['following'])
+
+    def test_cannot_follow_self_or_by_get(self):
+        """На себя подписаться нельзя, GET ничего не меняет"""
+        self.client.post(self.url('profile_follow', self.reader))
+        response = self.client.get(self.url('profile_follow'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_guest_redirected_to_login(self):
+        """Лента подписок и подписка требуют входа"""
+        guest = Client()
+        for url in (reverse('posts:follow_index'),
+                    self.url('profile_follow')):
+            with self.subTest(url=url):
+                response = guest.post(url)
+                self.assertEqual(response.status_code, HTTPStatus.FOUND)
+                self.assertIn(reverse('users:login'), response.url)
+
+    def test_new_post_fanned_out_in_background(self):
+        """Раздача нового поста уходит в фоновый поток после коммита"""
+        with mock.patch.object(timeline, 'executor') as executor, \
+                mock.patch('django.db.transaction.on_commit',
+                           side_effect=lambda func: func()):
+            post = Post.objects.create(text='Пост', author=self.author)
+        executor.return_value.submit.assert_called_once_with(
+            timeline.run_task, timeline.fan_out, post.pk)
+
+
+@override_settings(TIMELINE_FANOUT_ASYNC=False, TIMELINE_FANOUT_LIMIT=2)
+class TimelineTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='TimelineDog')
+        self.other = User.objects.create_user(username='OtherDog')
+        self.author = User.objects.create_user(username='QuietDog')
+        self.star = User.objects.create_user(username='StarDog')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        # у StarDog двое подписчиков — столько, сколько TIMELINE_FANOUT_LIMIT
+        for author in (self.author, self.star):
+            Follow.objects.create(user=self.reader, author=author)
+        Follow.objects.create(user=self.other, author=self.star)
+
+    def feed(self, token=None):
+        paginator = timeline.TimelinePaginator(self.reader, 3)
+        return paginator.get_page(token)
+
+    def test_posts_of_followed_authors_in_feed(self):
+        """В ленте посты подписок от новых к старым, раздаются
+        только посты непопулярных авторов"""
+        quiet = Post.objects.create(text='Тихий пост', author=self.author)
+        star = Post.objects.create(text='Пост звезды', author=self.star)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, quiet.pk)])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [star, quiet])
+
+    def test_cursor_pages_merge_sources(self):
+        """Курсор проходит слитую ленту без пропусков и повторов"""
+        authors = (self.author, self.star)
+        posts = [Post.objects.create(text=f'Пост {i}',
+                                     author=authors[i % 3 == 0])
+                 for i in range(8)]
+        expected = posts[::-1]
+        seen, page = [], self.feed()
+        while True:
+            seen.extend(page)
+            if not page.has_next():
+                break
+            page = self.feed(page.next_cursor)
+        self.assertEqual(seen, expected)
+        self.assertEqual(list(self.feed(page.previous_cursor)),
+                         expected[3:6])
+
+    @override_settings(DB_LOCK_BACKOFF_MS=0)
+    def test_post_saved_after_lock_fanned_out(self):
+        """Пост, сохраненный со второй попытки, рассылается как новый"""
+        created = []
+
+        def locked_once(sender, instance, **kwargs):
+            created.append(kwargs['created'])
+            if len(created) == 1:
+                raise OperationalError('database is locked')
+
+        post_save.connect(locked_once, sender=Post)
+        self.addCleanup(post_save.disconnect, locked_once, sender=Post)
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        post = Post.objects.get()
+        self.assertEqual(created, [True, True])
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, post.pk)])
+
+    def test_follow_backfills_and_unfollow_clears(self):
+        """Подписка добавляет последние посты автора, отписка убирает"""
+        post = Post.objects.create(text='Пост до подписки', author=self.other)
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.assertEqual(list(self.feed()), [post])
+        Follow.objects.filter(user=self.reader, author=self.other).delete()
+        self.assertEqual(list(self.feed()), [])
+
+    def test_author_below_limit_materialized(self):
+        """Автор, переставший быть популярным, раздается подписчикам"""
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=self.other, author=self.star).delete()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, post.pk)])
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_rebuild_timeline_command(self):
+        """rebuild_timeline собирает ленты заново"""
+        post = Post.objects.create(text='Тихий пост', author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_follow_index_within_budget(self):
+        """Лента подписок укладывается в объявленный бюджет"""
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}',
+                                author=(self.author, self.star)[i % 2])
+        url = reverse('posts:follow_index')
+        client = Client()
+        client.force_login(self.reader)
+        budget = resolve(url).func.query_budget
+        with QueryBudget(budget):
+            response = client.get(url)
+        with QueryBudget(budget):
+            client.get(url, {'cursor': response.context['next_cursor']})
@@ -7,6 +7,8 @@ from posts.forms import PostForm
 
 from http import HTTPStatus
 
+LOOKUP_GROUPS = 25
+
 User = get_user_model()
 
 
@@ -88,3 +90,82 @@ class PostCreateForm(TestCase):
         post_two = Post.objects.get(text='Измененное сообщение')
         self.assertEqual(response_edit.status_code, HTTPStatus.OK)
         self.assertEqual(post_two.text, form_data['text'])
+
+
+class GroupLookupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='LookupDog')
+        Group.objects.bulk_create(
+            Group(title=f'Котики {i:02}', slug=f'cats-{i}',
+                  description='Тестовое описание')
+            for i in range(LOOKUP_GROUPS)
+        )
+        cls.group = Group.objects.create(
+            title='Собаки',
+            slug='dogs',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def lookup(self, **params):
+        return self.client.get(reverse('posts:group_lookup'), params).json()
+
+    def test_form_renders_only_selected_group(self):
+        """Страница поста не рендерит список всех групп"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        response = self.author_client.get(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}))
+        self.assertContains(response, '<option', count=2)
+        self.assertContains(response, 'selected>Собаки</option>')
+        self.assertContains(response, reverse('posts:group_lookup'))
+
+    def test_lookup_by_prefix(self):
+        """Группы ищутся по началу названия без учета регистра"""
+        for query in ('соб', 'СОБАК', 'сОбАки'):
+            with self.subTest(query=query):
+                data = self.lookup(q=query)
+                self.assertEqual(data['results'],
+                                 [{'id': self.group.pk, 'text': 'Собаки'}])
+                self.assertFalse(data['pagination']['more'])
+
+    def test_title_lower_kept_in_sync(self):
+        """Название в нижнем регистре обновляется при правке группы"""
+        self.group.title = 'Большие Собаки'
+        self.group.save(update_fields=['title'])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.title_lower, 'большие собаки')
+        self.assertEqual(Group.objects.filter(
+            title_lower__startswith='котики').count(), LOOKUP_GROUPS)
+
+    def test_lookup_is_paginated(self):
+        """Результаты отдаются страницами"""
+        first = self.lookup(q='Котики')
+        second = self.lookup(q='Котики', page=2)
+        self.assertTrue(first['pagination']['more'])
+        self.assertFalse(second['pagination']['more'])
+        self.assertEqual(len(first['results']) + len(second['results']),
+                         LOOKUP_GROUPS)
+
+    def test_group_validated_by_key(self):
+        """Выбранная группа проверяется запросами по ключу: поле формы
+        загружает группу, модель проверяет внешний ключ"""
+        form = PostForm(data={'text': 'Текст', 'group': self.group.pk})
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid())
+
+    def test_invalid_group_key_rerenders_form(self):
+        """Значение группы, которое не может быть ключом, дает ошибку
+        поля, а не 500"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        response = self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Текст', 'group': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['group'])
+        self.assertContains(response, '<option', count=1)
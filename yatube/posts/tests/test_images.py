@@ -0,0 +1,126 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='picture.png', size=(1600, 900)):
+    stream = BytesIO()
+    Image.new('RGB', size, 'skyblue').save(stream, 'PNG')
+    return SimpleUploadedFile(name, stream.getvalue(),
+                              content_type='image/png')
+
+
+def run_on_commit(func):
+    # TestCase не коммитит транзакцию: колбэки выполняются сразу
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+                   TIMELINE_FANOUT_ASYNC=False)
+@mock.patch('django.db.transaction.on_commit', run_on_commit)
+class PostImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='PictureDog')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост с картинкой', 'image': image})
+        return Post.objects.get(author=self.user)
+
+    def test_upload_prepares_thumbnails(self):
+        """После загрузки готовы миниатюры всех ширин"""
+        post = self.create(make_image())
+        self.assertTrue(post.image.name.startswith('posts/'))
+        sizes = [(width, height) for _, width, height
+                 in thumbnails.load_thumbnails(post)]
+        self.assertEqual(sizes, [(320, 180), (640, 360), (960, 540),
+                                 (1280, 720)])
+
+    def test_narrow_image_not_upscaled(self):
+        """Узкая картинка не растягивается до больших ширин"""
+        post = self.create(make_image(size=(500, 250)))
+        widths = [width for _, width, _ in thumbnails.load_thumbnails(post)]
+        self.assertEqual(widths, [320, 500])
+
+    def test_pages_render_srcset_without_file_access(self):
+        """Лента и пост выводят srcset, не трогая файлы картинок"""
+        post = self.create(make_image())
+        cache.clear()
+        forbidden = mock.Mock(side_effect=AssertionError('обращение к файлу'))
+        urls = (reverse('posts:index'),
+                reverse('posts:profile', kwargs={'username': self.user}),
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        with mock.patch.object(FileSystemStorage, 'exists', forbidden), \
+                mock.patch.object(FileSystemStorage, 'size', forbidden), \
+                mock.patch.object(FileSystemStorage, 'open', forbidden), \
+                mock.patch.object(Image, 'open', forbidden):
+            for url in urls:
+                with self.subTest(url=url):
+                    content = self.client.get(url).content.decode()
+                    self.assertIn('320w', content)
+                    self.assertIn('1280w', content)
+
+    def test_thumbnails_prepared_in_process_pool(self):
+        """В обычном режиме миниатюры готовит пул процессов, а лента
+        до их готовности выводится без картинки"""
+        with override_settings(THUMBNAIL_ASYNC=True), \
+                mock.patch.object(thumbnails, 'pool') as pool:
+            post = self.create(make_image())
+        pool.return_value.submit.assert_called_once_with(
+            thumbnails.make_thumbnails, post.image.name)
+        self.assertEqual(post.thumbnails, '')
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'srcset')
+
+    def test_replaced_image_drops_thumbnails(self):
+        """Миниатюры старой картинки сбрасываются при замене"""
+        post = self.create(make_image())
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': post.text, 'image': make_image('other.png')})
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, '')
+        schedule.assert_called_once_with(post.pk, post.image.name)
+
+    def test_regenerate_thumbnails_command(self):
+        """regenerate_thumbnails готовит недостающие миниатюры"""
+        post = self.create(make_image())
+        expected = json.loads(post.thumbnails)
+        Post.objects.update(thumbnails='')
+        out = StringIO()
+        call_command('regenerate_thumbnails', workers=0, missing=True,
+                     stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(json.loads(post.thumbnails), expected)
+        self.assertIn('Картинок: 1, с ошибкой: 0', out.getvalue())
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
+from ..counters import rebuild_post_counters
 from ..models import Group, Post
 
 User = get_user_model()
@@ -32,3 +33,57 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Группа со счетчиком',
+            slug='counter-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-counter-slug',
+            description='Тестовое описание',
+        )
+
+    def assert_counts(self, user_count, group_count, other_group_count=0):
+        self.user.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.user.profile.posts_count, user_count)
+        self.assertEqual(self.group.posts_count, group_count)
+        self.assertEqual(self.other_group.posts_count, other_group_count)
+
+    def test_counters_follow_posts(self):
+        """Счетчики меняются при создании, переносе и удалении поста"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assert_counts(2, 1)
+        post.group = self.other_group
+        post.save()
+        self.assert_counts(2, 0, 1)
+        post.text = 'Правка без переноса'
+        post.save()
+        self.assert_counts(2, 0, 1)
+        post.delete()
+        self.assert_counts(1, 0, 0)
+
+    def test_rebuild_fixes_drift(self):
+        """Пересчет исправляет расхождения после массовой вставки"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}', group=self.group)
+            for i in range(3)
+        )
+        self.assert_counts(0, 0)
+        drift = rebuild_post_counters(fix=False)
+        self.assertEqual(len(drift), 2)
+        self.assert_counts(0, 0)
+        rebuild_post_counters()
+        self.assert_counts(3, 3)
+        self.assertEqual(rebuild_post_counters(), [])
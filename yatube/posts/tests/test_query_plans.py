@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import rebuild_post_counters
+from ..models import Group, Post
+
+User = get_user_model()
+
+FEED_POSTS = 15
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    """Строки плана запроса с сортировкой во временном B-дереве
+    или полным чтением таблицы постов мимо индекса."""
+    problems = []
+    for detail in explain(sql):
+        full_scan = (detail.startswith('SCAN')
+                     and 'posts_post' in detail
+                     and 'INDEX' not in detail)
+        if 'TEMP B-TREE' in detail or full_scan:
+            problems.append(detail)
+    return problems
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент не должны сортировать и сканировать таблицу постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='PlanDog')
+        cls.group = Group.objects.create(
+            title='Группа для планов',
+            slug='plan-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(FEED_POSTS)
+        )
+        rebuild_post_counters()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def feed_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+
+    def assert_plans_use_indexes(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url, params)
+        for query in queries:
+            sql = query['sql']
+            if 'posts_post' not in sql or not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, params=params, sql=sql):
+                self.assertEqual(plan_problems(sql), [])
+        return response
+
+    def test_page_feeds_use_indexes(self):
+        """?page=N: выборка страницы и подсчет идут по индексам"""
+        for url in self.feed_urls():
+            self.assert_plans_use_indexes(url)
+            self.assert_plans_use_indexes(url, {'page': 2})
+
+    def test_cursor_feeds_use_indexes(self):
+        """?cursor=: обе стороны курсора читаются по индексам"""
+        for url in self.feed_urls():
+            response = self.assert_plans_use_indexes(url)
+            response = self.assert_plans_use_indexes(
+                url, {'cursor': response.context['next_cursor']})
+            self.assert_plans_use_indexes(
+                url, {'cursor': response.context['previous_cursor']})
+
+    def test_post_detail_uses_indexes(self):
+        """Страница поста и счетчик постов автора идут по индексам"""
+        post = Post.objects.first()
+        self.assert_plans_use_indexes(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
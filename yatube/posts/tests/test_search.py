@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search_sql import TRIGGERS
+
+User = get_user_model()
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='SearchDog',
+                                            is_staff=True,
+                                            is_superuser=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Кот сидел на окне и смотрел на <b>дождь</b>',
+        )
+        Post.objects.create(author=self.user, text='Собака спала у двери')
+
+    def search(self, query):
+        return self.guest_client.get(reverse('posts:search'), {'q': query})
+
+    def test_search_finds_and_highlights(self):
+        """Поиск находит пост и подсвечивает слово, экранируя HTML"""
+        response = self.search('кот')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertContains(response, '<mark>Кот</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_search_by_prefix(self):
+        """Последнее слово запроса ищется по префиксу"""
+        response = self.search('смотр')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_search_ignores_query_syntax(self):
+        """Операторы FTS5 в запросе не ломают поиск"""
+        for query in ('"', 'кот OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response.status_code, 200)
+
+    def test_triggers_survive_migrations(self):
+        """Все триггеры индекса на месте после миграций, пересоздающих
+        таблицу постов"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = 'posts_post'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertTrue(set(TRIGGERS) <= triggers)
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.post.text = 'Попугай сидел на окне'
+        self.post.save()
+        self.assertEqual(len(self.search('кот').context['page_obj']), 0)
+        self.assertEqual(len(self.search('попугай').context['page_obj']), 1)
+        self.post.delete()
+        self.assertEqual(len(self.search('попугай').context['page_obj']), 0)
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс по частям"""
+        call_command('rebuild_search_index', chunk_size=1, stdout=StringIO())
+        self.assertEqual(len(self.search('собака').context['page_obj']), 1)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'кот'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
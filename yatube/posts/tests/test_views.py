@@ -1,9 +1,17 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
-from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from django import forms
 
+from core.query_budget import QueryBudget
+
 from .. models import Post, Group
+from ..counters import rebuild_post_counters
 from posts.forms import PostForm
 
 TEST_OF_POST: int = 13
@@ -83,6 +91,16 @@ class VIEWSTests(TestCase):
         first_object = response.context['page_obj'][0]
         self.assertEqual(first_object, self.post)
 
+    def test_profile_without_profile_row(self):
+        """Страница автора без строки Profile открывается
+        с посчитанными счетчиками"""
+        self.post.author.profile.delete()
+        response = self.guest_client.get(reverse(
+            'posts:profile', kwargs={'username': self.post.author.username}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['profile'].posts_count, 1)
+        self.assertContains(response, 'Всего постов: 1')
+
     def test_post_detail_correct_context(self):
         """Тест контекста для post_detail."""
         response = self.authorized_client.get(reverse('posts:post_detail',
@@ -171,6 +189,10 @@ class PaginatorViewsTest(TestCase):
             )
             )
         Post.objects.bulk_create(cls.posts)
+        rebuild_post_counters()
+
+    def setUp(self):
+        cache.clear()
 
     def test_paginator(self):
         """Тест паджинатора"""
@@ -192,3 +214,118 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(len(response.context.get('page_obj'
                                                       ).object_list),
                              THREE_POST)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация продолжает ленту с места,
+        где закончилась страница ?page=N"""
+        list_urls = {
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author}),
+        }
+        for tested_url in list_urls:
+            with self.subTest(tested_url=tested_url):
+                response = self.client.get(tested_url)
+                first_page = list(response.context['page_obj'])
+                response = self.client.get(
+                    tested_url, {'cursor': response.context['next_cursor']})
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), THREE_POST)
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(set(page_obj).isdisjoint(first_page))
+                response = self.client.get(
+                    tested_url,
+                    {'cursor': response.context['previous_cursor']})
+                self.assertEqual(list(response.context['page_obj']),
+                                 first_page)
+
+    def test_index_count_is_cached(self):
+        """Число постов главной берется из кеша до следующей записи"""
+        self.client.get(reverse('posts:index'), {'page': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'), {'page': 1})
+        self.assertFalse(any('COUNT' in query['sql'] for query in queries))
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(response.context['paginator'].count,
+                         TEST_OF_POST + 1)
+
+    def test_large_feed_count_is_estimated(self):
+        """Для большой ленты число страниц оценивается, а не считается"""
+        with mock.patch('posts.paginators.EXACT_COUNT_LIMIT', TEN_POST):
+            response = self.client.get(reverse('posts:index'))
+        paginator = response.context['paginator']
+        self.assertTrue(paginator.estimated)
+        self.assertGreaterEqual(paginator.count, TEN_POST + 1)
+        self.assertContains(response, f'~{paginator.num_pages} стр.')
+        self.assertNotContains(response, 'Последняя')
+
+    def test_cursor_paginator_bad_token(self):
+        """Битый токен курсора открывает первую страницу"""
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'не-токен'})
+        self.assertEqual(len(response.context['page_obj']), TEN_POST)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='SnoopDog5')
+        cls.group = Group.objects.create(
+            title='Группа для бюджета запросов',
+            slug='budget_slug',
+            description='Тестовое описание')
+        posts = []
+        for i in range(TEST_OF_POST):
+            author = User.objects.create_user(username=f'budget_{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'budget_{i}',
+                description='Тестовое описание')
+            posts.append(Post(text=f'Пост {i}', author=author, group=group))
+            posts.append(Post(text=f'Пост автора {i}', author=cls.author,
+                              group=cls.group))
+        Post.objects.bulk_create(posts)
+        rebuild_post_counters()
+        cls.post = Post.objects.filter(author=cls.author).first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+
+    def assert_within_budget(self, client, url, params=None):
+        budget = resolve(url).func.query_budget
+        with self.subTest(url=url, params=params):
+            with QueryBudget(budget):
+                response = client.get(url, params)
+            return response
+
+    def test_public_pages_within_budget(self):
+        """Ленты и страница поста укладываются в объявленный бюджет"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            response = self.assert_within_budget(self.guest_client, url)
+            next_cursor = response.context.get('next_cursor')
+            if next_cursor:
+                self.assert_within_budget(self.guest_client, url,
+                                          {'cursor': next_cursor})
+
+    def test_author_pages_within_budget(self):
+        """Создание и редактирование поста укладываются в бюджет"""
+        urls = (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            self.assert_within_budget(self.authorized_author, url)
@@ -0,0 +1,113 @@
+"""Миниатюры картинок постов.
+
+Миниатюры всех ширин POST_THUMBNAIL_WIDTHS готовятся сразу после
+загрузки картинки в пуле процессов, а не при первом показе ленты:
+разбор и сжатие картинок нагружают процессор и не должны задерживать
+ни ответ, ни соседние запросы этого процесса. Адреса и размеры
+готовых миниатюр сохраняются в Post.thumbnails, и шаблон строит
+srcset из них, не открывая и не проверяя файлы. Пока миниатюры
+не готовы, картинка в карточке не выводится.
+"""
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import get_thumbnail
+
+from .models import Post
+from .timeline import executor, run_task
+
+logger = logging.getLogger('yatube.thumbnails')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool(workers=None):
+    """Пул процессов для картинок. Процессы запускаются заново
+    (spawn), а не копируют процесс сервера вместе с его потоками
+    и соединениями с базой."""
+    return ProcessPoolExecutor(
+        max_workers=workers or settings.THUMBNAIL_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup)
+
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = process_pool()
+    return _pool
+
+
+def make_thumbnails(name):
+    """Готовит миниатюры картинки name из хранилища, возвращает
+    [url, ширина, высота] по возрастанию ширины. Выполняется
+    в процессе пула."""
+    sizes = {}
+    for width in settings.POST_THUMBNAIL_WIDTHS:
+        thumbnail = get_thumbnail(name, str(width))
+        # без увеличения узкая картинка дает одну и ту же миниатюру
+        # для нескольких ширин
+        sizes.setdefault(thumbnail.width,
+                         [thumbnail.url, thumbnail.width, thumbnail.height])
+    return [sizes[width] for width in sorted(sizes)]
+
+
+def try_make_thumbnails(name):
+    """make_thumbnails, которая не прерывает пакетную обработку:
+    для битой или пропавшей картинки возвращает None."""
+    try:
+        return make_thumbnails(name)
+    except Exception:
+        logger.exception('Миниатюры картинки %s не готовы', name)
+        return None
+
+
+def store_thumbnails(post_id, name, thumbnails):
+    """Сохраняет миниатюры поста, если картинку пока не заменили.
+    Сохранение через save сбрасывает карточки и ленты поста."""
+    post = Post.objects.filter(pk=post_id, image=name).first()
+    if post is None:
+        return
+    post.thumbnails = json.dumps(thumbnails)
+    post.save(update_fields=['thumbnails', 'modified'])
+
+
+def finish(post_id, name, future):
+    """Колбэк пула. Запись в базу передается фоновому потоку лент:
+    колбэк может выполниться и в потоке запроса, если миниатюры
+    готовы раньше, чем он добавлен."""
+    error = future.exception()
+    if error is not None:
+        logger.error('Миниатюры картинки %s не готовы', name,
+                     exc_info=error)
+        return
+    executor().submit(run_task, store_thumbnails, post_id, name,
+                      future.result())
+
+
+def schedule(post_id, name):
+    """Ставит картинку в очередь пула после коммита транзакции,
+    при THUMBNAIL_ASYNC=False готовит миниатюры сразу."""
+    def submit():
+        if not settings.THUMBNAIL_ASYNC:
+            store_thumbnails(post_id, name, make_thumbnails(name))
+            return
+        future = pool().submit(make_thumbnails, name)
+        future.add_done_callback(partial(finish, post_id, name))
+    transaction.on_commit(submit)
+
+
+def load_thumbnails(post):
+    """Миниатюры поста из сохраненных данных."""
+    if not post.thumbnails:
+        return []
+    return json.loads(post.thumbnails)
@@ -0,0 +1,226 @@
+"""Лента подписок.
+
+Новый пост раздается в материализованные ленты подписчиков
+(TimelineEntry), поэтому страница ленты — чтение per_page + 1 строк
+по индексу (user, -pub_date, -post), сколько бы авторов ни было
+в подписках. Раздача идет после коммита в фоновом потоке и ответ
+автору не задерживает.
+
+Пост автора, на которого подписано не меньше TIMELINE_FANOUT_LIMIT
+человек, стоил бы тысяч строк при записи. Такие посты не раздаются:
+TimelinePaginator подмешивает при чтении посты популярных авторов
+из подписок, вышедшие в пределах дат страницы ленты.
+"""
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+
+from core.db import retry_locked
+from users.models import Profile
+from .models import Follow, Post, TimelineEntry
+from .paginators import (BACKWARD, CursorPage, after_cursor, before_cursor,
+                         decode_cursor)
+
+logger = logging.getLogger('yatube.timeline')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Один фоновый поток на процесс: SQLite пишет по одному,
+    а задачи выполняются в порядке коммитов."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='timeline')
+    return _executor
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Задача ленты %s%r не выполнена',
+                         func.__name__, args)
+    finally:
+        # соединения фонового потока не переживают задачу
+        connections.close_all()
+
+
+def schedule(func, *args):
+    """Выполняет func(*args) после коммита текущей транзакции:
+    в фоновом потоке или, при TIMELINE_FANOUT_ASYNC=False, сразу."""
+    def submit():
+        if settings.TIMELINE_FANOUT_ASYNC:
+            executor().submit(run_task, func, *args)
+        else:
+            func(*args)
+    transaction.on_commit(submit)
+
+
+def is_popular(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def popular_followed(user):
+    """id популярных авторов из подписок читателя."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+@retry_locked
+def write_entries(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def insert_entries(user_ids, posts):
+    """Добавляет посты в ленты читателей user_ids пачками по
+    TIMELINE_BATCH_SIZE, возвращает число записанных строк."""
+    entries = (TimelineEntry(user_id=user_id, post_id=post.pk,
+                             pub_date=post.pub_date)
+               for user_id in user_ids for post in posts)
+    written = 0
+    while True:
+        batch = list(itertools.islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return written
+        write_entries(batch)
+        written += len(batch)
+
+
+def recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id)
+                .only('pub_date')[:settings.TIMELINE_BACKFILL])
+
+
+def fan_out(post_id):
+    """Раздает новый пост в ленты подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).only('pub_date', 'author').first()
+    if post is None or is_popular(post.author_id):
+        return 0
+    followers = list(Follow.objects.filter(author_id=post.author_id)
+                     .values_list('user_id', flat=True))
+    return insert_entries(followers, [post])
+
+
+def backfill(user_id, author_id):
+    """Подписка: последние посты автора попадают в ленту читателя."""
+    follows = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    if not follows.exists() or is_popular(author_id):
+        return 0
+    return insert_entries([user_id], recent_posts(author_id))
+
+
+def unfollow(user_id, author_id):
+    """Отписка: посты автора уходят из ленты читателя. Если автор
+    перестал быть популярным, его последние посты раздаются
+    подписчикам: подмешивать их при чтении больше некому."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+    if Profile.objects.filter(
+            user_id=author_id,
+            followers_count=settings.TIMELINE_FANOUT_LIMIT - 1).exists():
+        materialize(author_id)
+
+
+def materialize(author_id):
+    """Раздает последние посты автора всем его подписчикам."""
+    followers = list(Follow.objects.filter(author_id=author_id)
+                     .values_list('user_id', flat=True))
+    return insert_entries(followers, recent_posts(author_id))
+
+
+def rebuild_timelines():
+    """Пересчитывает счетчики подписчиков и заново собирает все ленты
+    из подписок: после загрузки постов в обход сигналов или потери
+    фоновых задач при остановке процесса."""
+    counts = dict(Follow.objects.order_by().values_list('author')
+                  .annotate(Count('pk')))
+    for profile in Profile.objects.only('user', 'followers_count'):
+        count = counts.get(profile.user_id, 0)
+        if profile.followers_count != count:
+            Profile.objects.filter(pk=profile.pk).update(
+                followers_count=count)
+    TimelineEntry.objects.all().delete()
+    written = 0
+    authors = Follow.objects.order_by().values_list(
+        'author', flat=True).distinct()
+    for author_id in authors:
+        if counts[author_id] < settings.TIMELINE_FANOUT_LIMIT:
+            written += materialize(author_id)
+    return written
+
+
+class TimelinePaginator:
+    """Курсорный пагинатор ленты подписок, как CursorPaginator.
+
+    Страница сливается из материализованной ленты читателя и постов
+    популярных авторов из подписок. Лента читается от курсора
+    по индексу не дальше per_page + 1 строк. Посты популярных
+    авторов выбираются одним запросом и только в пределах дат этой
+    страницы ленты: более далекие на страницу все равно не попадут.
+    """
+
+    def __init__(self, user, per_page):
+        self.user = user
+        self.per_page = per_page
+
+    def get_page(self, token=None):
+        cursor = decode_cursor(token) if token else None
+        if cursor is not None and cursor[0] == BACKWARD:
+            rows = self.collect(before_cursor, cursor[1:])
+            if rows:
+                has_previous = len(rows) > self.per_page
+                return CursorPage(rows[:self.per_page][::-1], self, True,
+                                  has_previous)
+            cursor = None
+        if cursor is None:
+            rows = self.collect()
+        else:
+            rows = self.collect(after_cursor, cursor[1:])
+        return CursorPage(rows[:self.per_page], self,
+                          len(rows) > self.per_page, cursor is not None)
+
+    def window(self, queryset, pk_field, select, position):
+        """per_page + 1 строк от позиции: без select — с начала ленты,
+        after_cursor — старше позиции, before_cursor — новее
+        (от старых к новым)."""
+        if select is None:
+            queryset = queryset.order_by('-pub_date', f'-{pk_field}')
+        else:
+            queryset = select(queryset, *position, pk_field=pk_field)
+        return list(queryset[:self.per_page + 1])
+
+    def collect(self, select=None, position=()):
+        newest_first = select is not before_cursor
+        popular = popular_followed(self.user)
+        entries = (TimelineEntry.objects.filter(user=self.user)
+                   .select_related('post__author', 'post__group'))
+        if popular:
+            # посты, разданные до того, как автор стал популярным
+            entries = entries.exclude(post__author_id__in=popular)
+        streams = [[entry.post for entry in self.window(
+            entries, 'post_id', select, position)]]
+        if popular:
+            posts = (Post.objects.filter(author_id__in=popular)
+                     .select_related('author', 'group'))
+            if len(streams[0]) > self.per_page:
+                edge = streams[0][-1].pub_date
+                lookup = 'pub_date__gte' if newest_first else 'pub_date__lte'
+                posts = posts.filter(**{lookup: edge})
+            streams.append(self.window(posts, 'pk', select, position))
+        merged = heapq.merge(*streams, reverse=newest_first,
+                             key=lambda post: (post.pub_date, post.pk))
+        return list(itertools.islice(merged, self.per_page + 1))
@@ -1,76 +1,262 @@
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 
-from .models import Post, Group, User
+from core.db import retry_locked
+from core.query_budget import query_budget
+from core.replicas import replica_reads
+from users.models import Profile
+from .cache import anonymous_page_cache, conditional_page, related_scopes
+from .models import Follow, Post, Group, User
+from .paginators import (CachedCountPaginator, CursorPaginator,
+                         WindowedPaginator, encode_cursor)
+from .search import SearchResults, prefix_q
+from .timeline import TimelinePaginator
 from posts.forms import PostForm, Post
 
 TEN_ENTRIES = 10
+LOOKUP_ENTRIES = 20
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, TEN_ENTRIES)
+def get_page_context(queryset, request, count=None, count_scope=None):
+    """Пагинация ленты: ?page=N для первых страниц,
+    ?cursor=<токен> для последовательного перехода вглубь.
+    Известное заранее count или закешированное по count_scope число
+    постов избавляют от COUNT(*) на каждый запрос."""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        paginator = CursorPaginator(queryset, TEN_ENTRIES)
+        page_obj = paginator.get_page(cursor)
+        return {
+            'paginator': paginator,
+            'page_number': None,
+            'page_obj': page_obj,
+            'next_cursor': page_obj.next_cursor,
+            'previous_cursor': page_obj.previous_cursor,
+        }
+    paginator = CachedCountPaginator(queryset, TEN_ENTRIES,
+                                     count_scope=count_scope)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    next_cursor = None
+    if page_obj.has_next():
+        next_cursor = encode_cursor(page_obj[len(page_obj) - 1])
     return {
         'paginator': paginator,
         'page_number': page_number,
         'page_obj': page_obj,
+        'next_cursor': next_cursor,
+        'previous_cursor': None,
     }
 
 
+@replica_reads
+@conditional_page('index')
+@anonymous_page_cache('index')
+@query_budget(4)
 def index(request):
     """Здесь код запроса к модели главной
     страницы и создание словаря контекста"""
     template = 'posts/index.html'
-    context = get_page_context(Post.objects.all(), request)
+    context = get_page_context(
+        Post.objects.select_related('author', 'group'), request,
+        count_scope='index')
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page('group:{slug}')
+@anonymous_page_cache('group:{slug}')
+@query_budget(4)
 def group_posts(request, slug):
     """Здесь код запроса к модели страницы
     постов группы и создание словаря контекста"""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all().order_by('-pub_date')
     context = {
         'group': group,
-        'posts': posts,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(get_page_context(
+        group.posts.select_related('author', 'group'), request,
+        count=group.posts_count))
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page('profile:{username}')
+@anonymous_page_cache('profile:{username}')
+@query_budget(4)
 def profile(request, username):
     """Здесь код запроса к модели страницы
     профайла и создание словаря контекста"""
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(User.objects.select_related('profile'),
+                             username=username)
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        # пользователь создан в обход сигнала, профиль появится
+        # после rebuild_post_counters; до тех пор счетчики считаются
+        profile = Profile(user=user, posts_count=user.posts.count(),
+                          followers_count=user.following.count())
+    following = (request.user.is_authenticated and request.user != user
+                 and user.following.filter(user=request.user).exists())
     context = {
         'username': user,
+        'profile': profile,
+        'following': following,
     }
-    context.update(get_page_context(user.posts.all(), request))
+    context.update(get_page_context(
+        user.posts.select_related('author', 'group'), request,
+        count=profile.posts_count))
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
+@login_required
+@query_budget(5)
+def follow_index(request):
+    """Лента постов авторов, на которых подписан пользователь"""
+    paginator = TimelinePaginator(request.user, TEN_ENTRIES)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        'paginator': paginator,
+        'page_number': None,
+        'page_obj': page_obj,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@require_POST
+@login_required
+def profile_follow(request, username):
+    """Подписка на автора"""
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username=username)
+
+
+@require_POST
+@login_required
+def profile_unfollow(request, username):
+    """Отписка от автора"""
+    Follow.objects.filter(user=request.user,
+                          author__username=username).delete()
+    return redirect('posts:profile', username=username)
+
+
+def load_post(request, post_id):
+    """Пост страницы для валидаторов. Загружается целиком одним
+    запросом и достается view, если страницу все же придется
+    рендерить."""
+    if not hasattr(request, 'loaded_post'):
+        request.loaded_post = (
+            Post.objects.select_related('author__profile', 'group')
+            .filter(pk=post_id).first())
+    return request.loaded_post
+
+
+def post_modified(request, post_id):
+    """Валидатор Last-Modified страницы поста."""
+    post = load_post(request, post_id)
+    return post and post.modified
+
+
+def post_scopes(request, post_id):
+    """Имя автора, его счетчик постов и группа выводятся на странице
+    поста: она зависит и от их областей."""
+    post = load_post(request, post_id)
+    if post is None:
+        return ()
+    return related_scopes(post.author.username,
+                          post.group and post.group.slug)
+
+
+@replica_reads
+@conditional_page('post:{post_id}', last_modified=post_modified,
+                  related=post_scopes)
+@query_budget(2)
 def post_detail(request, post_id):
     """Здесь код запроса к модели страницы
     деталей поста и создание словаря контекста"""
-    posts = get_object_or_404(Post, pk=post_id)
+    posts = getattr(request, 'loaded_post', None) or get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'),
+        pk=post_id)
     context = {
         'posts': posts,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(3)
+def search(request):
+    """Полнотекстовый поиск по постам с подсветкой найденного"""
+    query = request.GET.get('q', '').strip()
+    paginator = WindowedPaginator(SearchResults(query), TEN_ENTRIES)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'paginator': paginator,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(1)
+def group_lookup(request):
+    """Группы по началу названия для поля выбора группы,
+    постранично, в формате select2."""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    groups = Group.objects.order_by('title', 'pk')
+    if query:
+        groups = groups.filter(prefix_q('title_lower', query))
+    start = (page - 1) * LOOKUP_ENTRIES
+    rows = list(groups.values_list('pk', 'title')[
+        start:start + LOOKUP_ENTRIES + 1])
+    return JsonResponse({
+        'results': [{'id': pk, 'text': title}
+                    for pk, title in rows[:LOOKUP_ENTRIES]],
+        'pagination': {'more': len(rows) > LOOKUP_ENTRIES},
+    })
+
+
+@retry_locked
+def save_post(post, adding):
+    """Сохраняет пост вместе с обработчиками post_save в транзакции,
+    которую retry_locked повторяет целиком, если база занята.
+
+    Новый пост перед каждой попыткой снова становится новым: после
+    отката у него остался бы id, и обработчики post_save, которые
+    рассылают пост в ленты и готовят миниатюры, приняли бы его
+    за правку.
+    """
+    if adding:
+        post.pk = None
+        post._state.adding = True
+    post.save()
+
+
 @login_required
+@query_budget(2)
 def post_create(request):
     """Здесь код запроса к модели страницы
     редактирования поста и создание словаря контекста"""
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        save_post(post, adding=True)
         return redirect('posts:profile', post.author)
 
     form = PostForm()
@@ -81,19 +267,21 @@ def post_create(request):
 
 
 @login_required
+@query_budget(4)
 def post_edit(request, post_id):
     """Здесь код запроса к модели страницы
     создания поста и создание словаря контекста"""
     post = get_object_or_404(Post, id=post_id)
     is_edit = True
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
 
-    form = PostForm(request.POST or None, instance=post)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    instance=post)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        save_post(post, adding=False)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -0,0 +1,95 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse_lazy
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Виджет автодополнения админки, который берет выбранный объект
+    из preloaded, а не запрашивает его из базы для каждой строки."""
+
+    preloaded = ()
+
+    def selected_objects(self, selected_choices):
+        preloaded = {str(obj.pk): obj for obj in self.preloaded}
+        if selected_choices <= preloaded.keys():
+            return [preloaded[pk] for pk in selected_choices]
+        return self.choices.queryset.using(self.db).filter(
+            pk__in=selected_choices)
+
+    def optgroups(self, name, value, attr=None):
+        default = (None, [], 0)
+        groups = [default]
+        has_selected = False
+        selected_choices = {
+            str(v) for v in value
+            if str(v) not in self.choices.field.empty_values
+        }
+        if not self.is_required and not self.allow_multiple_selected:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for obj in self.selected_objects(selected_choices):
+            option_value = obj.pk
+            option_label = self.choices.field.label_from_instance(obj)
+            selected = (
+                str(option_value) in value
+                and (has_selected is False or self.allow_multiple_selected)
+            )
+            has_selected |= selected
+            index = len(default[1])
+            default[1].append(self.create_option(
+                name, option_value, option_label, selected_choices, index))
+        return groups
+
+
+class PreloadedGroupForm(forms.ModelForm):
+    """Форма строки списка постов: выбранная группа уже загружена
+    вместе с постом через list_select_related."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        widget = getattr(widget, 'widget', widget)
+        if self.instance.group_id is not None:
+            widget.preloaded = (self.instance.group,)
+
+
+class GroupLookupSelect(forms.Select):
+    """Список групп, в котором рендерится только выбранная группа.
+
+    Остальные варианты подгружает скрипт из posts:group_lookup
+    по мере ввода, поэтому страница не зависит от числа групп.
+    """
+
+    class Media:
+        js = ('js/group_lookup.js',)
+
+    def __init__(self, attrs=None):
+        attrs = {'data-lookup-url': reverse_lazy('posts:group_lookup'),
+                 **(attrs or {})}
+        super().__init__(attrs)
+
+    def selected_keys(self, value):
+        """Ключи выбранных групп. Значение из запроса, которое не может
+        быть ключом (например, group=abc), пропускается: форма
+        перерисовывается с ошибкой поля, а не падает на запросе."""
+        pk_field = self.choices.queryset.model._meta.pk
+        keys = set()
+        for item in value:
+            if str(item) in self.choices.field.empty_values:
+                continue
+            try:
+                keys.add(pk_field.to_python(item))
+            except ValidationError:
+                continue
+        return keys
+
+    def optgroups(self, name, value, attrs=None):
+        selected = self.selected_keys(value)
+        options = [self.create_option(
+            name, '', self.choices.field.empty_label, not selected, 0)]
+        queryset = self.choices.queryset.filter(pk__in=selected)
+        for index, obj in enumerate(queryset, start=1):
+            options.append(self.create_option(
+                name, obj.pk, self.choices.field.label_from_instance(obj),
+                True, index))
+        return [(None, options, 0)]
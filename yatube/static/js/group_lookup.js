@@ -0,0 +1,44 @@
+// Поиск группы по началу названия для <select data-lookup-url>.
+// Варианты подгружаются с сервера, полный список групп не рендерится.
+(function () {
+  'use strict';
+  var DELAY = 250;
+
+  function setOptions(select, results) {
+    var current = select.value;
+    var keep = Array.prototype.filter.call(select.options, function (option) {
+      return option.value === '' || option.value === current;
+    });
+    select.innerHTML = '';
+    keep.forEach(function (option) { select.appendChild(option); });
+    results.forEach(function (group) {
+      if (String(group.id) === current) {
+        return;
+      }
+      select.appendChild(new Option(group.text, group.id));
+    });
+  }
+
+  function attach(select) {
+    var input = document.createElement('input');
+    var timer = null;
+    input.type = 'search';
+    input.placeholder = 'Начните вводить название группы';
+    input.className = select.className;
+    select.parentNode.insertBefore(input, select);
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.lookupUrl
+          + '?q=' + encodeURIComponent(input.value.trim());
+        fetch(url)
+          .then(function (response) { return response.json(); })
+          .then(function (data) { setOptions(select, data.results); });
+      }, DELAY);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-lookup-url]').forEach(attach);
+  });
+})();
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Profile(models.Model):
+    """Модель для хранения денормализованных данных пользователя"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='user',
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name='posts count')
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='followers count')
+
+    def __str__(self):
+        return self.user.username
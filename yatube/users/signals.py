@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """У каждого пользователя есть профиль со счетчиками."""
+    if created and not raw:
+        Profile.objects.create(user=instance)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,7 +38,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
-    'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'django.contrib.admin',
@@ -46,16 +47,24 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sorl.thumbnail',
+    # последним: прогрев в CoreConfig.ready импортирует URLconf,
+    # а admin.site.urls должен собираться после autodiscover
+    'core.apps.CoreConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.replicas.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -63,7 +72,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,6 +87,22 @@ TEMPLATES = [
     },
 ]
 
+# боевой режим загрузки шаблонов: разобранные шаблоны хранятся
+# в памяти процесса, а не читаются и не разбираются на каждый запрос
+TEMPLATE_CACHE = os.environ.get('TEMPLATE_CACHE',
+                                '0' if DEBUG else '1') == '1'
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+# компилировать шаблоны и обращать URL при запуске процесса (core.warmup)
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP',
+                                 '1' if TEMPLATE_CACHE else '0') == '1'
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -88,8 +113,114 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # соединение переживает запрос: PRAGMA и кеш страниц SQLite
+        # не настраиваются заново на каждый запрос
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+    }
+}
+
+# реплики для чтения лент (core.replicas): пути к копиям базы SQLite
+# через запятую, например снимкам, которые периодически обновляются
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICA_PATHS', '').split(',')),
+        start=1):
+    DATABASE_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
     }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# после записи пользователь столько секунд читает с основной базы
+PRIMARY_STICKY_SECONDS = 5
+# как часто перепроверяется доступность реплики
+REPLICA_CHECK_INTERVAL = 10
+
+# выполняются на каждом новом соединении SQLite (core.db);
+# busy_timeout идет первым, чтобы остальные PRAGMA ждали блокировку
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
 }
+# повторы транзакции, получившей «database is locked»
+DB_LOCK_RETRIES = 5
+DB_LOCK_BACKOFF_MS = 20
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# По умолчанию LocMemCache: он живет в памяти одного процесса, и при
+# нескольких воркерах у каждого свои копии страниц, карточек и чисел
+# постов. Версии лент хранятся в базе (posts.FeedVersion), поэтому
+# запись в одном воркере сбрасывает страницы и валидаторы всех, но
+# числа постов в других воркерах обновятся только через COUNT_TIMEOUT,
+# а память под кеш расходует каждый. Для запуска в несколько процессов
+# задайте общий кеш через CACHE_BACKEND и CACHE_LOCATION, например
+# memcached.
+# Сессии лежат в отдельном кеше: тысячи карточек постов не должны
+# вытеснять их и версии лент при чистке по MAX_ENTRIES.
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+CACHE_MAX_ENTRIES = {
+    # карточки трех видов, страницы, версии и числа постов лент
+    'default': int(os.environ.get('CACHE_MAX_ENTRIES', 30000)),
+    'sessions': int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', 10000)),
+}
+CACHES = {}
+for alias, max_entries in CACHE_MAX_ENTRIES.items():
+    CACHES[alias] = {
+        'BACKEND': CACHE_BACKEND,
+        # у LocMemCache хранилище выбирается по LOCATION
+        'LOCATION': CACHE_LOCATION or alias,
+        'KEY_PREFIX': alias,
+    }
+    if CACHE_BACKEND.endswith('LocMemCache'):
+        # memcached передает OPTIONS своему клиенту как есть
+        CACHES[alias]['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+
+
+# Sessions and authentication
+# сессия читается из кеша и пишется в кеш и базу одновременно,
+# пользователь запроса хранится в памяти процесса (core.auth)
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+USER_CACHE_SECONDS = 30
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+
+# Post images
+# миниатюры картинок постов готовятся после загрузки в пуле процессов
+# (posts.thumbnails), шаблоны выводят их srcset по сохраненным данным
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+POST_THUMBNAIL_WIDTHS = (320, 640, 960, 1280)
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS',
+                                       os.cpu_count() or 1))
+THUMBNAIL_UPSCALE = False
+THUMBNAIL_PRESERVE_FORMAT = True
+THUMBNAIL_QUALITY = 85
+
+
+# Follow timeline
+# новые посты раздаются в ленты подписчиков (posts.timeline) после
+# коммита в фоновом потоке; у авторов, на которых подписано не меньше
+# TIMELINE_FANOUT_LIMIT человек, посты подмешиваются при чтении ленты
+
+TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT', 1000))
+TIMELINE_FANOUT_ASYNC = True
+TIMELINE_BATCH_SIZE = 500
+# столько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 50
 
 
 # Password validation
@@ -131,6 +262,17 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.environ.get('STATIC_ROOT',
+                             os.path.join(BASE_DIR, 'collected_static'))
+# боевая сборка статики (core.staticfiles): collectstatic дает файлам
+# имена с хешем и пишет сжатые копии, {% static %} берет имена
+# из манифеста сборки
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST',
+                                 '0' if DEBUG else '1') == '1'
+if STATIC_MANIFEST:
+    STATICFILES_STORAGE = 'core.staticfiles.PrecompressedManifestStorage'
+# раздавать STATIC_ROOT самим Django, если перед ним нет веб-сервера
+STATIC_SERVE = os.environ.get('STATIC_SERVE', '0') == '1'
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -139,3 +281,50 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# метрики для Prometheus: каталог, через который процессы-воркеры
+# складывают свои значения, и адреса, с которых доступен /metrics
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# профили запросов: сотрудники снимают их добавлением ?profile
+# к адресу, остальные запросы профилируются с долей SAMPLE_RATE;
+# без PROFILING_DIR middleware профилирования не подключается
+PROFILING_DIR = os.environ.get('PROFILING_DIR')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+
+# журнал запросов к базе: медленнее порога или повторенных в одном
+# ответе REPEAT_THRESHOLD раз; последние BUFFER записей видны
+# сотрудникам на /slow-queries/, все пишутся в SLOW_QUERY_LOG_FILE
+# (по умолчанию во временный каталог, а не в рабочую копию)
+SLOW_QUERY_THRESHOLD_MS = float(
+    os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_REPEAT_THRESHOLD = int(
+    os.environ.get('SLOW_QUERY_REPEAT_THRESHOLD', 10))
+SLOW_QUERY_BUFFER = 200
+SLOW_QUERY_LOG_FILE = os.environ.get(
+    'SLOW_QUERY_LOG_FILE',
+    os.path.join(tempfile.gettempdir(), 'yatube_slow_queries.log'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            # файл создается при первой записи
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
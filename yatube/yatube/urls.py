@@ -13,8 +13,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.views import (metrics_view, profiling_view, slow_queries_view,
+                        static_view)
 
 urlpatterns = [
     # импорт правил из приложения posts
@@ -23,4 +28,17 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
+    path('profiling/', profiling_view, name='profiling'),
+    path('slow-queries/', slow_queries_view, name='slow_queries'),
 ]
+
+if settings.STATIC_SERVE:
+    urlpatterns.append(re_path(
+        rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.+)$', static_view,
+        name='static'))
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL,
+                          document_root=settings.MEDIA_ROOT)